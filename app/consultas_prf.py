@@ -0,0 +1,253 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+from utils import conectar, versao_dataset, invalidar_se_mudou
+from geo_grade import NIVEIS_GRADE, expressao_sql_celula, condicao_sql_coordenadas, montar_grade
+from trechos_prf import (normalizar_br, normalizar_km, bin_km, celulas_trecho, trechos_criticos,
+                         agregar_celulas as agregar_trechos)
+
+# ==============================================================================
+# MODO SQL (PUSHDOWN) DA PÁGINA PRF
+# Filtros e agregações rodam como GROUP BY no MySQL; só os resultados pequenos
+# voltam para o Streamlit. Os filtros chegam como tupla (anos, ufs, brs, fisico).
+# Quando o ETL materializou o cubo (prf_cubo*), as consultas leem dele.
+# ==============================================================================
+
+# Colunas que podem ser interpoladas nas consultas (evita SQL injection)
+COLUNAS_PERMITIDAS = {
+    'UF', 'BR', 'MUNICIPIO', 'SEXO', 'ESTADO_FISICO', 'TIPO_VEICULO', 'MARCA',
+    'CAUSA_PRINCIPAL', 'CONDICAO_METEREOLOGICA', 'FASE_DIA', 'TIPO_PISTA',
+    'IDADE', 'ANO_FABRICACAO_VEICULO'
+}
+
+# Tabelas agregadas geradas pelo ETL (materializar_cubo_prf), da menor para a maior
+CUBOS_PRF = [
+    ('prf_cubo_sinistros', {'ANO', 'MES', 'UF', 'BR', 'MUNICIPIO'}),
+    ('prf_cubo', {'ANO', 'MES', 'UF', 'BR', 'MUNICIPIO', 'TIPO_VEICULO', 'ESTADO_FISICO', 'CAUSA_PRINCIPAL'}),
+]
+
+def _validar_coluna(coluna):
+    if coluna not in COLUNAS_PERMITIDAS:
+        raise ValueError(f"Coluna não permitida em consulta PRF: {coluna}")
+    return coluna
+
+def _where(filtros, extras=None):
+    """Monta a cláusula WHERE (e os parâmetros) a partir dos filtros da barra lateral."""
+    anos, ufs, brs, fisico = filtros
+    condicoes, params = list(extras or []), {}
+    if anos: condicoes.append("ANO IN :anos"); params['anos'] = [int(a) for a in anos]
+    if ufs: condicoes.append("UF IN :ufs"); params['ufs'] = list(ufs)
+    if brs: condicoes.append("BR IN :brs"); params['brs'] = list(brs)
+    if fisico: condicoes.append("ESTADO_FISICO IN :fisico"); params['fisico'] = list(fisico)
+    clausula = ("WHERE " + " AND ".join(condicoes)) if condicoes else ""
+    return clausula, params
+
+def _ler(sql, params=None):
+    """Executa a consulta com parâmetros de lista expandidos (IN :lista)."""
+    params = params or {}
+    stmt = text(sql)
+    listas = [bindparam(k, expanding=True) for k, v in params.items() if isinstance(v, (list, tuple))]
+    if listas: stmt = stmt.bindparams(*listas)
+    with conectar() as conn:
+        return pd.read_sql(stmt, conn, params=params)
+
+@st.cache_data(ttl=600)
+def cubo_disponivel():
+    """True se as tabelas agregadas da PRF existem e têm dados."""
+    try:
+        for tabela, _ in CUBOS_PRF:
+            if _ler(f"SELECT 1 AS ok FROM {tabela} LIMIT 1").empty: return False
+        return True
+    except Exception:
+        return False
+
+@st.cache_data(ttl=600)
+def tabela_disponivel(tabela):
+    """True se a tabela agregada existe e tem dados."""
+    try:
+        return not _ler(f"SELECT 1 AS ok FROM {tabela} LIMIT 1").empty
+    except Exception:
+        return False
+
+def _origem(colunas, filtros):
+    """
+    Escolhe a menor tabela que responde à consulta: um cubo que contenha todas as
+    colunas agrupadas/filtradas, ou a tabela bruta. Devolve (tabela, expressão de contagem).
+    """
+    usadas = set(colunas)
+    for coluna, selecao in zip(('ANO', 'UF', 'BR', 'ESTADO_FISICO'), filtros):
+        if selecao: usadas.add(coluna)
+    if cubo_disponivel():
+        for tabela, dims in CUBOS_PRF:
+            if usadas <= dims: return tabela, "SUM(ENVOLVIDOS)"
+    return "acidentes_prf", "COUNT(*)"
+
+# --- OPÇÕES DOS FILTROS ---
+@st.cache_data(ttl=3600)
+def opcoes_filtros_prf():
+    try:
+        base, _ = _origem({'ANO', 'UF'}, ((), (), (), ()))
+        base_fisico, _ = _origem({'ESTADO_FISICO'}, ((), (), (), ()))
+        anos = _ler(f"SELECT DISTINCT ANO FROM {base} ORDER BY ANO DESC")['ANO'].astype(int).tolist()
+        ufs = _ler(f"SELECT DISTINCT UF FROM {base} WHERE UF IS NOT NULL ORDER BY UF")['UF'].astype(str).tolist()
+        fisico = _ler(f"SELECT DISTINCT ESTADO_FISICO FROM {base_fisico} WHERE ESTADO_FISICO IS NOT NULL ORDER BY ESTADO_FISICO")
+        return {'anos': anos, 'ufs': ufs, 'fisico': fisico['ESTADO_FISICO'].astype(str).tolist()}
+    except Exception as e:
+        print(f"Erro ao consultar opções de filtro PRF: {e}")
+        return {'anos': [], 'ufs': [], 'fisico': []}
+
+@st.cache_data(ttl=3600)
+def opcoes_br_prf(anos, ufs):
+    filtros = (anos, ufs, (), ())
+    base, _ = _origem({'BR'}, filtros)
+    where, params = _where(filtros)
+    df = _ler(f"SELECT DISTINCT BR FROM {base} {where} ORDER BY BR", params)
+    return df['BR'].astype(str).tolist()
+
+# --- AGREGAÇÕES ---
+@st.cache_data(ttl=3600)
+def kpis_prf(filtros):
+    where, params = _where(filtros)
+    base, contagem = _origem(set(), filtros)
+    # ID distinto só é somável no grão da ocorrência; no prf_cubo (pessoa/veículo) vem do cubo de máscaras
+    sinistros = {'prf_cubo_sinistros': "SUM(SINISTROS)", 'prf_cubo': "NULL"}.get(base, "COUNT(DISTINCT ID)")
+    df = _ler(f"""
+        SELECT {contagem} AS envolvidos, {sinistros} AS sinistros,
+               COALESCE(SUM(MORTOS), 0) AS mortos, COALESCE(SUM(FERIDOS), 0) AS feridos
+        FROM {base} {where}
+    """, params)
+    kpis = {k: int(v) if pd.notna(v) else 0 for k, v in df.iloc[0].items()}
+    if base == 'prf_cubo': kpis['sinistros'] = _sinistros_por_fisico(filtros)
+    return kpis
+
+def _sinistros_por_fisico(filtros):
+    """
+    Ocorrências com o filtro de Estado Físico: soma das células de prf_cubo_sinistros_fisico cuja
+    máscara de Estados Físicos cruza a seleção (exato). Sem esse cubo, COUNT(DISTINCT ID) na tabela bruta.
+    """
+    anos, ufs, brs, fisico = filtros
+    if tabela_disponivel('prf_cubo_sinistros_fisico'):
+        bits = _ler("SELECT ESTADO_FISICO, BIT FROM prf_fisico_bit")
+        mascara = sum(1 << int(b) for v, b in zip(bits['ESTADO_FISICO'], bits['BIT']) if v in set(fisico))
+        if not mascara: return 0
+        where, params = _where((anos, ufs, brs, ()), ["(FISICO_MASCARA & :mascara) <> 0"])
+        params['mascara'] = mascara
+        return int(_ler(f"SELECT COALESCE(SUM(SINISTROS), 0) AS n FROM prf_cubo_sinistros_fisico {where}", params)['n'].iloc[0])
+    where, params = _where(filtros)
+    return int(_ler(f"SELECT COUNT(DISTINCT ID) AS n FROM acidentes_prf {where}", params)['n'].iloc[0])
+
+@st.cache_data(ttl=3600)
+def contagem_prf(coluna, filtros, limite=None, excluir=()):
+    """Equivalente a df_f[coluna].value_counts().head(limite).reset_index()."""
+    coluna = _validar_coluna(coluna)
+    extras = [f"COALESCE({coluna}, 'NÃO INFORMADO') NOT IN :excluir"] if excluir else []
+    where, params = _where(filtros, extras)
+    if excluir: params['excluir'] = list(excluir)
+    base, contagem = _origem({coluna}, filtros)
+    sql = f"""
+        SELECT COALESCE({coluna}, 'NÃO INFORMADO') AS {coluna}, {contagem} AS count
+        FROM {base} {where}
+        GROUP BY 1 ORDER BY count DESC
+    """
+    if limite: sql += f" LIMIT {int(limite)}"
+    return _ler(sql, params)
+
+@st.cache_data(ttl=3600)
+def distribuicao_prf(coluna, filtros, minimo, maximo):
+    """Contagem por valor numérico (minimo < valor <= maximo), base dos histogramas."""
+    coluna = _validar_coluna(coluna)
+    where, params = _where(filtros, [f"{coluna} > :minimo", f"{coluna} <= :maximo"])
+    params.update({'minimo': minimo, 'maximo': maximo})
+    return _ler(f"""
+        SELECT {coluna}, COUNT(*) AS count FROM acidentes_prf {where}
+        GROUP BY {coluna} ORDER BY {coluna}
+    """, params)
+
+@st.cache_data(ttl=3600)
+def marcas_fatais_prf(filtros, regex, marcas_excluir, limite=15):
+    extras = [
+        "(MORTOS > 0 OR UPPER(ESTADO_FISICO) IN ('ÓBITO', 'MORTO', 'FATAL'))",
+        "UPPER(MARCA) NOT IN :marcas_excluir",
+        "UPPER(TIPO_VEICULO) REGEXP :regex",
+    ]
+    where, params = _where(filtros, extras)
+    params.update({'marcas_excluir': list(marcas_excluir), 'regex': regex})
+    return _ler(f"""
+        SELECT MARCA, COUNT(*) AS count FROM acidentes_prf {where}
+        GROUP BY MARCA ORDER BY count DESC LIMIT {int(limite)}
+    """, params)
+
+@st.cache_data(ttl=3600)
+def uf_tipo_veiculo_prf(filtros):
+    where, params = _where(filtros)
+    base, contagem = _origem({'UF', 'TIPO_VEICULO'}, filtros)
+    return _ler(f"""
+        SELECT UF, COALESCE(TIPO_VEICULO, 'NÃO INFORMADO') AS TIPO_VEICULO, {contagem} AS Qtd
+        FROM {base} {where} GROUP BY 1, 2
+    """, params)
+
+@st.cache_data(ttl=3600)
+def municipios_prf(filtros):
+    where, params = _where(filtros)
+    base, contagem = _origem({'MUNICIPIO', 'UF'}, filtros)
+    return _ler(f"""
+        SELECT COALESCE(MUNICIPIO, 'NÃO INFORMADO') AS MUNICIPIO, UF, {contagem} AS Qtd
+        FROM {base} {where} GROUP BY 1, 2
+    """, params)
+
+@st.cache_data(ttl=3600)
+def grade_geo_prf(filtros, nivel):
+    """
+    Ocorrências e óbitos por célula da grade geográfica (ver geo_grade). Lê da tabela
+    prf_geo_grade do ETL; com filtro de Estado Físico (fora da tabela), agrega a bruta.
+    """
+    tamanho = NIVEIS_GRADE[nivel][0]
+    if not filtros[3] and tabela_disponivel('prf_geo_grade'):
+        where, params = _where(filtros, ["NIVEL = :nivel"])
+        params['nivel'] = nivel
+        df = _ler(f"""
+            SELECT CELULA, SUM(QTD) AS Qtd, SUM(MORTOS) AS Mortos
+            FROM prf_geo_grade {where} GROUP BY CELULA
+        """, params)
+    else:
+        where, params = _where(filtros, [condicao_sql_coordenadas()])
+        df = _ler(f"""
+            SELECT {expressao_sql_celula(tamanho)} AS CELULA, COUNT(*) AS Qtd, COALESCE(SUM(MORTOS), 0) AS Mortos
+            FROM acidentes_prf {where} GROUP BY 1
+        """, params)
+    return montar_grade(df['CELULA'], df['Qtd'], df['Mortos'], tamanho)
+
+@st.cache_data(ttl=3600)
+def trechos_prf(filtros, janela_km=1.0, peso='Qtd', limite=30):
+    """
+    Trechos críticos (janelas de 'janela_km' por rodovia, ver trechos_prf). Lê da tabela
+    prf_trechos_km do ETL; com filtro de Estado Físico (fora da tabela), agrega a bruta.
+    """
+    if not filtros[3] and tabela_disponivel('prf_trechos_km'):
+        where, params = _where(filtros)
+        df = _ler(f"""
+            SELECT UF, BR, KM_BIN, SUM(QTD) AS Qtd, SUM(MORTOS) AS Mortos
+            FROM prf_trechos_km {where} GROUP BY 1, 2, 3
+        """, params)
+        km_bin = df['KM_BIN'].to_numpy(dtype='float64')
+    else:
+        where, params = _where(filtros, ["BR IS NOT NULL", "KM IS NOT NULL"])
+        df = _ler(f"""
+            SELECT UF, BR, KM, COUNT(*) AS Qtd, COALESCE(SUM(MORTOS), 0) AS Mortos
+            FROM acidentes_prf {where} GROUP BY 1, 2, 3
+        """, params)
+        km_bin = bin_km(normalizar_km(df['KM']))
+    celulas, ufs = celulas_trecho(df['UF'], normalizar_br(df['BR']), km_bin)
+    ordem = np.argsort(celulas, kind='stable')
+    ids, qtd, mortos = agregar_trechos(celulas[ordem], df['Mortos'].to_numpy()[ordem], df['Qtd'].to_numpy()[ordem])
+    return trechos_criticos(ids, qtd, mortos, ufs, janela_km, limite, peso)
+
+# --- INVALIDAÇÃO POR VERSÃO ---
+# As consultas acima não recebem a versão como argumento: quando o ETL carimba uma
+# nova carga da PRF, o cache delas é limpo de uma vez (as outras páginas não são afetadas).
+CACHES_PRF = (cubo_disponivel, tabela_disponivel, opcoes_filtros_prf, opcoes_br_prf, kpis_prf, contagem_prf,
+              distribuicao_prf, marcas_fatais_prf, uf_tipo_veiculo_prf, municipios_prf, grade_geo_prf, trechos_prf)
+
+def sincronizar_versao():
+    return invalidar_se_mudou('consultas_prf', versao_dataset('prf'), *CACHES_PRF)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = ipc = None
+
+# ==============================================================================
+# ESTOQUE COMPARTILHADO ENTRE RÉPLICAS (ARROW IPC MAPEADO EM MEMÓRIA)
+# Cada dataset pesado é gravado uma única vez por versão em <pasta>/<nome>/<chave>.arrow
+# (Arrow IPC sem compressão). As réplicas do Streamlit na mesma máquina mapeiam o
+# arquivo (mmap) e montam o DataFrame apontando para as páginas dele: os dados ficam
+# uma vez só no page cache do sistema, e não uma cópia privada por processo.
+# Sem cópia ficam as colunas sem nulos: floats são gravados com NaN (não null) e as
+# categorias são remontadas direto dos índices do dicionário. Inteiros anuláveis
+# (Int8...) e datas com NaT ainda são copiados por réplica.
+# Os arrays mapeados são somente leitura: alterar a base levanta erro em vez de
+# vazar para as outras réplicas.
+# Sem dependência do Streamlit: scripts/benchmark_prf.py importa este módulo via sys.path.
+# ==============================================================================
+EXTENSAO = '.arrow'
+META_ATTRS = b'dashboard_attrs'  # df.attrs (versao_prf, versao_obitos...) viajam nos metadados do schema
+VERSOES_MANTIDAS = 2             # a anterior fica para réplicas que ainda não trocaram de versão
+ESPERA_PUBLICACAO = 600          # s: trava mais velha que isso é de uma réplica que morreu gravando
+
+def caminho_dataset(pasta, nome, versao):
+    chave = hashlib.sha256(str(versao).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(pasta, nome, chave + EXTENSAO)
+
+def _tabela_arrow(df):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for i, c in enumerate(df.columns):
+        if df[c].dtype.kind == 'f':
+            # NaN como valor (sem bitmap de nulos): a coluna volta ao pandas sem cópia
+            tabela = tabela.set_column(i, tabela.field(i).with_nullable(True), pa.array(df[c].to_numpy(), from_pandas=False))
+    attrs = json.dumps(df.attrs, default=str).encode('utf-8')
+    return tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), META_ATTRS: attrs})
+
+def _para_pandas(tabela):
+    """DataFrame sobre os buffers mapeados. Categorias sem nulos: códigos = índices do arquivo (sem cópia)."""
+    categorias = {}
+    for nome, coluna in zip(tabela.column_names, tabela.columns):
+        if pa.types.is_dictionary(coluna.type) and coluna.num_chunks == 1 and coluna.null_count == 0:
+            pedaco = coluna.chunk(0)
+            codigos = pedaco.indices.to_numpy(zero_copy_only=True)
+            categorias[nome] = pd.Categorical.from_codes(codigos, pedaco.dictionary.to_pandas(), validate=False)
+    # split_blocks: uma coluna por bloco, sem consolidar (consolidar copiaria tudo)
+    resto = tabela.select([c for c in tabela.column_names if c not in categorias]).to_pandas(split_blocks=True)
+    # copy=False: nem cópia nem consolidação (df.insert copiaria cada categoria)
+    df = pd.DataFrame({c: categorias[c] if c in categorias else resto[c] for c in tabela.column_names}, copy=False)
+    df.attrs.update(json.loads((tabela.schema.metadata or {}).get(META_ATTRS, b'{}')))
+    return df
+
+def anexar(pasta, nome, versao):
+    """DataFrame mapeado da versão, ou None se ainda não foi publicada (ou o arquivo está ilegível)."""
+    caminho = caminho_dataset(pasta, nome, versao)
+    if pa is None or not os.path.exists(caminho): return None
+    try:
+        return _para_pandas(ipc.open_file(pa.memory_map(caminho)).read_all())
+    except (OSError, pa.ArrowException) as e:
+        print(f"Compartilhado: '{caminho}' ilegível ({e}); carregando cópia privada.")
+        return None
+
+def _limpar(pasta_nome, atual):
+    """Mantém as VERSOES_MANTIDAS mais recentes. No Linux, apagar um arquivo ainda mapeado é seguro."""
+    arquivos = sorted((os.path.join(pasta_nome, a) for a in os.listdir(pasta_nome) if a.endswith(EXTENSAO)),
+                      key=os.path.getmtime, reverse=True)
+    for caminho in arquivos[VERSOES_MANTIDAS:]:
+        if caminho == atual: continue
+        try: os.remove(caminho)
+        except OSError: pass
+
+def publicar(df, pasta, nome, versao):
+    """Grava o DataFrame (tmp + rename atômico: quem mapeia nunca vê arquivo pela metade). Devolve o caminho."""
+    destino = caminho_dataset(pasta, nome, versao)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tabela = _tabela_arrow(df)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp, 'wb') as f:
+            with ipc.new_file(f, tabela.schema) as escritor: escritor.write_table(tabela)
+        os.replace(tmp, destino)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+    _limpar(os.path.dirname(destino), destino)
+    return destino
+
+def _travar(trava):
+    """Cria a trava de publicação (O_EXCL: só uma réplica consegue). Trava abandonada é assumida."""
+    for _ in range(2):
+        try:
+            os.close(os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(trava) < ESPERA_PUBLICACAO: return False
+                os.remove(trava)
+            except OSError:
+                pass
+    return False
+
+def obter(pasta, nome, versao, carregar, espera=ESPERA_PUBLICACAO):
+    """
+    DataFrame compartilhado da versão. Já publicada: só mapeia. Senão, a réplica que
+    pega a trava carrega (carregar()), publica e mapeia; as outras esperam o arquivo
+    em vez de carregar a mesma base em paralelo. Qualquer falha devolve a cópia privada.
+    """
+    df = anexar(pasta, nome, versao)
+    if df is not None: return df
+    if pa is None: return carregar()
+
+    caminho = caminho_dataset(pasta, nome, versao)
+    trava = caminho + '.lock'
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        dono = _travar(trava)
+    except OSError as e:
+        print(f"Compartilhado: pasta '{pasta}' indisponível ({e}); carregando cópia privada.")
+        return carregar()
+
+    if not dono:
+        limite = time.time() + espera
+        while os.path.exists(trava) and not os.path.exists(caminho) and time.time() < limite:
+            time.sleep(0.5)
+        df = anexar(pasta, nome, versao)
+        return df if df is not None else carregar()
+
+    try:
+        df = anexar(pasta, nome, versao)  # publicada entre a primeira olhada e a trava
+        if df is not None: return df
+        privado = carregar()
+        if privado.empty: return privado  # falha de carga não vira versão publicada
+        inicio = time.perf_counter()
+        try:
+            publicar(privado, pasta, nome, versao)
+        except Exception as e:
+            print(f"Compartilhado: não foi possível publicar '{nome}' ({e}); usando cópia privada.")
+            return privado
+        print(f"Compartilhado: '{nome}' publicado em {caminho} ({os.path.getsize(caminho) / 1024 ** 2:,.0f} MB, "
+              f"{time.perf_counter() - inicio:.1f}s)")
+        df = anexar(pasta, nome, versao)
+        return df if df is not None else privado
+    finally:
+        try: os.remove(trava)
+        except OSError: pass
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# GRADE GEOGRÁFICA (BINNING ESPACIAL DETERMINÍSTICO)
+# Cada coordenada cai em uma célula quadrada de 'tamanho' graus. O id da célula é
+# linha * colunas + coluna, contado a partir de (-90, -180), então é o mesmo no
+# Dashboard (numpy) e no ETL (SQL, ver expressao_sql_celula).
+# Sem dependência do Streamlit: o ETL importa este módulo via sys.path.
+# ==============================================================================
+
+# Níveis de zoom do mapa: nome -> (tamanho da célula em graus, zoom inicial do mapa, raio em px)
+NIVEIS_GRADE = {
+    'Brasil': (0.5, 3, 18),
+    'Regional': (0.1, 5, 12),
+    'Local': (0.02, 7, 8),
+}
+LIMITE_CELULAS = 20000  # teto do payload enviado ao navegador
+
+def _colunas(tamanho):
+    return int(np.ceil(360 / tamanho))
+
+def celulas_geo(lat, lon, tamanho):
+    """Id (int64) da célula de cada coordenada; -1 para coordenadas nulas, zeradas ou fora do globo."""
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    validas = ~np.isnan(lat) & ~np.isnan(lon) & (lat != 0) & (lon != 0) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    linha = np.floor((np.where(validas, lat, 0) + 90) / tamanho).astype('int64')
+    coluna = np.floor((np.where(validas, lon, 0) + 180) / tamanho).astype('int64')
+    return np.where(validas, linha * _colunas(tamanho) + coluna, -1)
+
+def centro_celula(celulas, tamanho):
+    """(lat, lon) do centro de cada célula."""
+    linha, coluna = np.divmod(np.asarray(celulas, dtype='int64'), _colunas(tamanho))
+    return (linha + 0.5) * tamanho - 90, (coluna + 0.5) * tamanho - 180
+
+def agregar_celulas(celulas, mortos, tamanho, limite=LIMITE_CELULAS):
+    """
+    Ocorrências e óbitos por célula (ignora -1). Devolve no máximo 'limite' células,
+    as de maior contagem, com desempate pelo id — o resultado não depende de amostragem.
+    """
+    validas = celulas >= 0
+    ids, inverso, qtd = np.unique(celulas[validas], return_inverse=True, return_counts=True)
+    obitos = np.bincount(inverso, weights=np.asarray(mortos)[validas], minlength=len(ids))
+    return montar_grade(ids, qtd, obitos, tamanho, limite)
+
+def montar_grade(ids, qtd, obitos, tamanho, limite=LIMITE_CELULAS):
+    """Tabela (CELULA, LAT, LON, Qtd, Mortos) ordenada por Qtd desc, id asc."""
+    df = pd.DataFrame({'CELULA': np.asarray(ids, dtype='int64'), 'Qtd': np.asarray(qtd, dtype='int64'),
+                       'Mortos': np.asarray(obitos, dtype='int64')})
+    df = df.sort_values(['Qtd', 'CELULA'], ascending=[False, True], kind='stable').head(limite)
+    df['LAT'], df['LON'] = centro_celula(df['CELULA'].to_numpy(), tamanho)
+    return df.reset_index(drop=True)
+
+def expressao_sql_celula(tamanho, lat='LATITUDE', lon='LONGITUDE'):
+    """Mesma regra de celulas_geo em SQL (MySQL), para agregar direto no banco."""
+    return f"(FLOOR(({lat} + 90) / {tamanho}) * {_colunas(tamanho)} + FLOOR(({lon} + 180) / {tamanho}))"
+
+def condicao_sql_coordenadas(lat='LATITUDE', lon='LONGITUDE'):
+    return (f"{lat} IS NOT NULL AND {lon} IS NOT NULL AND {lat} <> 0 AND {lon} <> 0 "
+            f"AND ABS({lat}) <= 90 AND ABS({lon}) <= 180")
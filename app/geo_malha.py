@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+import numpy as np
+
+# ==============================================================================
+# MALHA DOS ESTADOS (GEOJSON LOCAL + VARIANTES SIMPLIFICADAS)
+# A malha fica em disco (settings.GEO_DIR) com um manifest.json que registra a
+# versão, a fonte e o sha256 de cada variante. As variantes são simplificadas
+# por Douglas-Peucker em trechos entre vértices de junção: a divisa entre dois
+# estados é simplificada uma única vez e fica idêntica nos dois polígonos
+# (sem frestas nem sobreposição no mapa).
+# Sem dependência do Streamlit: scripts/preparar_geojson.py importa este módulo via sys.path.
+# ==============================================================================
+URL_FONTE_GEO = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+ARQUIVO_MANIFESTO = 'manifest.json'
+PROPRIEDADES_GEO = ['sigla', 'name']  # o resto das propriedades não é usado pelos mapas
+
+# Variantes geradas: nome -> tolerância em graus (0 = só arredonda as coordenadas)
+TOLERANCIAS_GEO = {
+    'original': 0.0,
+    'detalhado': 0.005,
+    'medio': 0.02,
+    'leve': 0.05,
+}
+CASAS_COORDENADAS = 4  # ~11 m: abaixo do que a menor tolerância enxerga
+
+def douglas_peucker(pontos, tolerancia):
+    """Máscara dos pontos mantidos (extremos sempre mantidos). Iterativo: sem limite de recursão."""
+    n = len(pontos)
+    manter = np.zeros(n, dtype=bool)
+    manter[0] = manter[-1] = True
+    if n < 3 or tolerancia <= 0:
+        manter[:] = True
+        return manter
+    pilha = [(0, n - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j - i < 2: continue
+        a, b = pontos[i], pontos[j]
+        meio = pontos[i + 1:j]
+        ab = b - a
+        comprimento = np.hypot(*ab)
+        if comprimento == 0: distancias = np.hypot(*(meio - a).T)
+        else: distancias = np.abs(ab[0] * (meio[:, 1] - a[1]) - ab[1] * (meio[:, 0] - a[0])) / comprimento
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            k += i + 1
+            manter[k] = True
+            pilha += [(i, k), (k, j)]
+    return manter
+
+def _aneis(geometria):
+    """Lista de anéis (listas de [lon, lat]) de um Polygon/MultiPolygon, na ordem do GeoJSON."""
+    if geometria['type'] == 'Polygon': return list(geometria['coordinates'])
+    return [anel for poligono in geometria['coordinates'] for anel in poligono]
+
+def _remontar(geometria, aneis):
+    aneis = iter(aneis)
+    if geometria['type'] == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': [next(aneis) for _ in geometria['coordinates']]}
+    return {'type': 'MultiPolygon', 'coordinates': [[next(aneis) for _ in p] for p in geometria['coordinates']]}
+
+def _juncoes(todos_aneis):
+    """
+    Vértices onde o conjunto de anéis vizinhos muda (início/fim de uma divisa).
+    Um vértice é junção se aparece com vizinhos diferentes em anéis diferentes.
+    """
+    vizinhos = {}
+    for anel in todos_aneis:
+        pontos = [tuple(p) for p in anel[:-1]]
+        for i, p in enumerate(pontos):
+            par = frozenset((pontos[i - 1], pontos[(i + 1) % len(pontos)]))
+            vizinhos.setdefault(p, set()).add(par)
+    return {p for p, pares in vizinhos.items() if len(pares) > 1}
+
+def _simplificar_anel(anel, tolerancia, juncoes, memo):
+    pontos = [tuple(p) for p in anel[:-1]]
+    if len(pontos) < 4: return anel
+    fixos = [i for i, p in enumerate(pontos) if p in juncoes]
+    if not fixos:
+        # Anel sem junções (ilha ou enclave): fixa o menor e o maior vértice, que independem do início do anel
+        fixos = sorted({pontos.index(min(pontos)), pontos.index(max(pontos))})
+    resultado = []
+    for n, inicio in enumerate(fixos):
+        fim = fixos[(n + 1) % len(fixos)]
+        trecho = pontos[inicio:fim + 1] if fim > inicio else pontos[inicio:] + pontos[:fim + 1]
+        # Mesma divisa, mesmo resultado: simplifica sempre no sentido canônico e guarda pelo trecho
+        chave = min(tuple(trecho), tuple(reversed(trecho)))
+        if chave not in memo:
+            memo[chave] = [p for p, m in zip(chave, douglas_peucker(np.array(chave), tolerancia)) if m]
+        simplificado = memo[chave] if chave == tuple(trecho) else memo[chave][::-1]
+        resultado += simplificado[:-1]
+    if len(resultado) < 3: return anel
+    return [list(p) for p in resultado] + [list(resultado[0])]
+
+def simplificar_geojson(geo, tolerancia, casas=CASAS_COORDENADAS):
+    """Cópia do FeatureCollection com coordenadas arredondadas e anéis simplificados (preservando divisas)."""
+    features = [f for f in geo['features'] if f.get('geometry')]
+    aneis = [[[round(float(x), casas), round(float(y), casas)] for x, y in anel]
+             for f in features for anel in _aneis(f['geometry'])]
+    # Arredondar pode repetir vértices consecutivos: tira as repetições antes de procurar junções
+    aneis = [[p for i, p in enumerate(anel) if i == 0 or p != anel[i - 1]] for anel in aneis]
+    if tolerancia > 0:
+        juncoes, memo = _juncoes(aneis), {}
+        aneis = [_simplificar_anel(anel, tolerancia, juncoes, memo) for anel in aneis]
+
+    saida, pos = [], 0
+    for f in features:
+        qtd = len(_aneis(f['geometry']))
+        propriedades = {k: f['properties'][k] for k in PROPRIEDADES_GEO if k in f.get('properties', {})}
+        saida.append({'type': 'Feature', 'properties': propriedades,
+                      'geometry': _remontar(f['geometry'], aneis[pos:pos + qtd])})
+        pos += qtd
+    return {'type': 'FeatureCollection', 'features': saida}
+
+def contar_vertices(geo):
+    return sum(len(anel) for f in geo['features'] for anel in _aneis(f['geometry']))
+
+def _sha256(caminho):
+    with open(caminho, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+def gerar_malhas(geo, pasta, fonte=URL_FONTE_GEO):
+    """Grava todas as variantes + manifest.json em 'pasta'. Devolve o manifesto."""
+    os.makedirs(pasta, exist_ok=True)
+    bruto = json.dumps(geo, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    manifesto = {
+        'versao': hashlib.sha256(bruto).hexdigest()[:12],  # muda só quando a malha de origem muda
+        'fonte': fonte,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'variantes': {},
+    }
+    for nome, tolerancia in TOLERANCIAS_GEO.items():
+        variante = simplificar_geojson(geo, tolerancia)
+        arquivo = f"brasil_estados_{nome}.geojson"
+        caminho = os.path.join(pasta, arquivo)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f: json.dump(variante, f, separators=(',', ':'))
+        os.replace(caminho + '.tmp', caminho)
+        manifesto['variantes'][nome] = {
+            'arquivo': arquivo, 'tolerancia': tolerancia, 'vertices': contar_vertices(variante),
+            'bytes': os.path.getsize(caminho), 'sha256': _sha256(caminho),
+        }
+    # O manifesto vai por último: quem o lê sempre encontra as variantes que ele descreve
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f: json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+    return manifesto
+
+def ler_malha(pasta, variante):
+    """GeoJSON da variante se o manifesto existir e o sha256 do arquivo conferir; senão None."""
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding='utf-8') as f: manifesto = json.load(f)
+        info = manifesto['variantes'][variante]
+        caminho = os.path.join(pasta, info['arquivo'])
+        with open(caminho, 'rb') as f: conteudo = f.read()
+    except (OSError, KeyError, ValueError):
+        return None
+    if hashlib.sha256(conteudo).hexdigest() != info['sha256']:
+        print(f"Malha '{variante}' não confere com o manifesto (versão {manifesto.get('versao')}): ignorando.")
+        return None
+    return json.loads(conteudo)
@@ -3,8 +3,11 @@ import os
 from PIL import Image
 # Importa as views atualizadas
 from views import produtos, prf, obitos, comparativo 
+import consultas_prf
 # Importa as funções de carregamento do utils.py
-from utils import carregar_dados_gerais, carregar_dados_prf, carregar_dados_obitos, get_tema_config
+from utils import (carregar_dados_gerais, get_tema_config, metricas_pool, metricas_carga_gestao, versao_dataset,
+                   versoes_datasets, iniciar_aquecimento, dataset_aquecido, estado_aquecimento)
+from config import settings
 
 # 1. Configuração da Página
 st.set_page_config(
@@ -26,11 +29,25 @@ cfg = get_tema_config(tema_selecionado)
 with col_txt:
     st.write(f"Modo **{tema_selecionado}**")
 
-# --- Botão Limpar Cache ---
-if st.sidebar.button("🔄 Atualizar Dados", help="Recarrega os dados do banco"):
-    st.cache_data.clear()
+# --- Botão Atualizar: consulta os carimbos do ETL agora; só recarrega os datasets que mudaram ---
+if st.sidebar.button("🔄 Atualizar Dados", help="Verifica novas cargas do ETL e recarrega só o que mudou"):
+    versoes_datasets.clear()
     st.rerun()
 
+# --- Métricas do Pool de Conexões ---
+with st.sidebar.expander("🔌 Pool de Conexões"):
+    m = metricas_pool()
+    st.caption(f"Em uso: {m['em_uso']} | Ociosas: {m['ociosas']} | Overflow: {m['overflow']} (pool {m['tamanho']})")
+    st.caption(f"Checkouts: {m['checkouts']:,} | Conexões abertas: {m['conexoes_abertas']:,}")
+    st.caption(f"Espera média: {m['espera_media_s']*1000:.1f} ms | Máx: {m['espera_max_s']*1000:.1f} ms")
+    carga = metricas_carga_gestao()
+    if carga['tabelas']:
+        st.caption(f"Carga da gestão: {len(carga['tabelas'])} tabelas em {carga['total_s']*1000:.0f} ms")
+        for t in carga['tabelas']: st.caption(f"· {t['tabela']}: {t['linhas']:,} linhas, {t['segundos']*1000:.0f} ms ({t['origem']})")
+    for nome, e in estado_aquecimento().items():
+        st.caption(f"Aquecido · {nome}: há {e['idade_s']/60:.0f} min, carga de {e['segundos']:.1f}s"
+                   + (" (atualizando...)" if e['carregando'] else ""))
+
 st.sidebar.divider()
 
 # --- Navegação Atualizada ---
@@ -115,7 +132,12 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # 4. Carregamento Inicial (Gestão)
-df_mapa, df_org, df_prod, df_status, df_users, df_raw, df_mun = carregar_dados_gerais()
+df_mapa, df_org, df_prod, df_status, df_users, df_raw, df_mun = carregar_dados_gerais(versao_dataset('gestao'))
+
+# Datasets pesados: carregados e renovados em segundo plano (a PRF só no modo memória)
+consultas_prf.sincronizar_versao()
+prf_no_banco = settings.PRF_MODO == 'sql' or (settings.PRF_MODO == 'auto' and consultas_prf.cubo_disponivel())
+iniciar_aquecimento('obitos', *([] if prf_no_banco else ['prf']))
 
 # 5. Header Principal
 c_logo, c_titulo = st.columns([1, 8])
@@ -143,16 +165,20 @@ elif pagina == "📈 Análise Temporal":
     produtos.render_analise_temporal(df_raw, cfg)
 
 elif pagina == "🚗 Sinistros PRF":
-    df_prf = carregar_dados_prf()
-    prf.render_prf(df_prf, cfg)
+    if prf_no_banco:
+        # Agregações no banco (cubo PRF quando disponível): nenhuma linha individual fica em memória
+        prf.render_prf_sql(cfg)
+    else:
+        df_prf = dataset_aquecido('prf', "Carregando base PRF...")
+        prf.render_prf(df_prf, cfg)
 
 elif pagina == "🏥 Óbitos (DATASUS)":
-    df_obitos = carregar_dados_obitos()
+    df_obitos = dataset_aquecido('obitos', "Carregando dados de Óbitos (SIM)...")
     obitos.render_obitos(df_obitos, cfg)
 
 elif pagina == "⚖️ Comparativo Geral":
     # Carrega dados necessários para o cruzamento de informações
-    df_obitos = carregar_dados_obitos()
+    df_obitos = dataset_aquecido('obitos', "Carregando dados de Óbitos (SIM)...")
     
     # ATENÇÃO: Passamos df_raw (tabela bruta de produtos) em vez de df_prod
     # df_raw contém as colunas de data/ano necessárias para o eixo X do gráfico
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# TRECHOS CRÍTICOS (BR + KM)
+# BR e KM chegam como texto ('116', '116.0', '12,5'); aqui viram posição numérica
+# na rodovia. Cada registro cai em uma célula de PASSO_KM dentro da sua rodovia
+# (UF, BR); a célula é um inteiro ordenável, então uma janela deslizante de N km
+# vira duas buscas binárias sobre somas acumuladas.
+# Sem dependência do Streamlit: o ETL importa este módulo via sys.path.
+# ==============================================================================
+PASSO_KM = 0.1
+CELULAS_POR_RODOVIA = 100_000  # até 10.000 km por rodovia
+BR_MAX = 1000                  # BRs federais têm até 3 dígitos
+
+def _por_categoria(serie, func):
+    """Aplica 'func' uma vez por valor distinto (categorias) e devolve o resultado por linha (float64)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        por_cat = np.append(func(pd.Series(serie.cat.categories.astype(str))).to_numpy(dtype='float64'), np.nan)
+        return por_cat[serie.cat.codes.to_numpy()]
+    valores, distintos = pd.factorize(serie.astype(str))
+    return np.append(func(pd.Series(distintos)).to_numpy(dtype='float64'), np.nan)[valores]
+
+def normalizar_br(serie):
+    """'116', '116.0', 'BR-116' -> 116.0 (NaN se não houver número)."""
+    return _por_categoria(serie, lambda s: pd.to_numeric(s.str.extract(r'(\d+)', expand=False), errors='coerce'))
+
+def normalizar_km(serie):
+    """'12,5' / '12.5' -> 12.5 (NaN se inválido)."""
+    return _por_categoria(serie, lambda s: pd.to_numeric(s.str.strip().str.replace(',', '.', regex=False), errors='coerce'))
+
+def celulas_trecho(uf, br, km_bin):
+    """
+    Célula (int64) de cada registro: (código da UF * BR_MAX + BR) * CELULAS_POR_RODOVIA + km_bin.
+    -1 para BR/KM inválidos. Devolve (celulas, ufs) — 'ufs' decodifica o código da UF.
+    """
+    uf = pd.Series(uf)
+    if isinstance(uf.dtype, pd.CategoricalDtype):
+        codigos, ufs = uf.cat.codes.to_numpy(), uf.cat.categories.astype(str)
+    else:
+        codigos, ufs = pd.factorize(uf.astype(str), sort=True)
+    br = np.asarray(br, dtype='float64')
+    km_bin = np.asarray(km_bin, dtype='float64')
+    validos = ~np.isnan(br) & ~np.isnan(km_bin) & (br > 0) & (br < BR_MAX) & (km_bin >= 0) & (km_bin < CELULAS_POR_RODOVIA) & (codigos >= 0)
+    rodovia = codigos.astype('int64') * BR_MAX + np.where(validos, br, 0).astype('int64')
+    celulas = np.where(validos, rodovia * CELULAS_POR_RODOVIA + np.where(validos, km_bin, 0).astype('int64'), -1)
+    return celulas, np.asarray(ufs, dtype=object)
+
+def bin_km(km):
+    """Índice da faixa de PASSO_KM que contém o km (arredondado para evitar 0.30000000000000004)."""
+    return np.floor(np.round(np.asarray(km, dtype='float64') / PASSO_KM, 6))
+
+def preparar_trechos(uf, br, km, mortos):
+    """Índice por rodovia: células de cada linha já ordenadas (ordem estável) e os óbitos na mesma ordem."""
+    celulas, ufs = celulas_trecho(uf, normalizar_br(br), bin_km(normalizar_km(km)))
+    ordem = np.argsort(celulas, kind='stable')
+    return {'ordem': ordem, 'celulas': celulas[ordem], 'mortos': np.asarray(mortos)[ordem], 'ufs': ufs}
+
+def agregar_celulas(celulas_ordenadas, mortos, qtd=None):
+    """Soma registros (ou 'qtd') e óbitos por célula, sobre células já ordenadas; ignora -1."""
+    inicio_validos = np.searchsorted(celulas_ordenadas, 0)
+    c = celulas_ordenadas[inicio_validos:]
+    if not len(c): return c, np.zeros(0, 'int64'), np.zeros(0, 'int64')
+    inicios = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+    contagem = np.diff(np.r_[inicios, len(c)]) if qtd is None else np.add.reduceat(np.asarray(qtd, 'int64')[inicio_validos:], inicios)
+    obitos = np.add.reduceat(np.asarray(mortos, 'int64')[inicio_validos:], inicios)
+    return c[inicios], contagem, obitos
+
+def trechos_criticos(ids, qtd, mortos, ufs, janela_km=1.0, limite=30, peso='Qtd'):
+    """
+    Janelas de 'janela_km' com mais ocorrências (ou óbitos, peso='Mortos'), sem sobreposição
+    na mesma rodovia. Cada janela começa em uma célula ocupada; empates pelo id (determinístico).
+    """
+    colunas = ['UF', 'BR', 'KM_INICIO', 'KM_FIM', 'Qtd', 'Mortos']
+    if not len(ids): return pd.DataFrame(columns=colunas)
+    w = max(1, int(round(janela_km / PASSO_KM)))
+    soma_q = np.r_[0, np.cumsum(qtd)]
+    soma_m = np.r_[0, np.cumsum(mortos)]
+    # A janela [célula, célula + w) não cruza rodovias: km < 10.000 deixa folga no fim de cada bloco
+    fim = np.searchsorted(ids, ids + w)
+    idx = np.arange(len(ids))
+    total_q = soma_q[fim] - soma_q[idx]
+    total_m = soma_m[fim] - soma_m[idx]
+    score = total_q if peso == 'Qtd' else total_m
+
+    # Cada janela escolhida descarta no máximo 2w-1 vizinhas: bastam as limite*2w melhores (com empates)
+    k = limite * 2 * w
+    candidatos = idx
+    if len(score) > k:
+        corte = np.partition(score, len(score) - k)[len(score) - k]
+        candidatos = np.flatnonzero(score >= corte)
+
+    escolhidos, por_rodovia = [], {}
+    for i in candidatos[np.lexsort((ids[candidatos], -score[candidatos]))]:
+        if score[i] <= 0 or len(escolhidos) >= limite: break
+        rodovia, inicio = divmod(int(ids[i]), CELULAS_POR_RODOVIA)
+        if any(abs(inicio - outro) < w for outro in por_rodovia.get(rodovia, ())): continue
+        por_rodovia.setdefault(rodovia, []).append(inicio)
+        escolhidos.append((ufs[rodovia // BR_MAX], rodovia % BR_MAX, round(inicio * PASSO_KM, 1),
+                           round((inicio + w) * PASSO_KM, 1), int(total_q[i]), int(total_m[i])))
+    return pd.DataFrame(escolhidos, columns=colunas)
@@ -36,18 +36,16 @@ def render_comparativo(df_prod_raw, df_obitos, tema):
     df_p = df_prod_raw.copy()
     df_p.columns = [str(c).upper().strip() for c in df_p.columns]
 
-    # Prepara DF Óbitos
-    df_o = df_obitos.copy() if not df_obitos.empty else pd.DataFrame()
-    if not df_o.empty:
-        df_o.columns = [c.lower().strip() for c in df_o.columns]
+    # Óbitos já em formato longo (obitos_fato): ano, mes, local, ..., obitos
+    df_o = df_obitos
 
     # --- 2. FILTRO DE ESTADO (OPCIONAL) ---
     col_uf_prod = next((c for c in ['UF', 'ESTADO', 'SG_UF'] if c in df_p.columns), None)
-    col_uf_obito = next((c for c in ['local_nome', 'uf', 'estado', 'nome'] if c in df_o.columns), None)
+    col_uf_obito = 'local' if 'local' in df_o.columns else None
 
     opcoes_uf = set()
     if col_uf_prod: opcoes_uf.update(df_p[col_uf_prod].dropna().apply(normalizar_uf).unique())
-    if col_uf_obito and not df_o.empty: opcoes_uf.update(df_o[col_uf_obito].dropna().apply(normalizar_uf).unique())
+    if col_uf_obito and not df_o.empty: opcoes_uf.update(normalizar_uf(v) for v in df_o[col_uf_obito].dropna().unique())
     
     lista_ufs = sorted([x for x in opcoes_uf if x is not None])
     
@@ -63,8 +61,9 @@ def render_comparativo(df_prod_raw, df_obitos, tema):
             df_p['_UF_NORM'] = df_p[col_uf_prod].apply(normalizar_uf)
             df_p = df_p[df_p['_UF_NORM'] == uf_selecionada]
         if col_uf_obito and not df_o.empty:
-            df_o['_UF_NORM'] = df_o[col_uf_obito].apply(normalizar_uf)
-            df_o = df_o[df_o['_UF_NORM'] == uf_selecionada]
+            # Normaliza só os locais distintos e filtra pelos que correspondem à UF
+            locais = [v for v in df_o[col_uf_obito].dropna().unique() if normalizar_uf(v) == uf_selecionada]
+            df_o = df_o[df_o[col_uf_obito].isin(locais)]
 
     # --- 3. PROCESSAMENTO DE PRODUTOS (POR ANO) ---
     cols_ano = ['ANO', 'ANO_BASE', 'EXERCICIO']
@@ -91,32 +90,14 @@ def render_comparativo(df_prod_raw, df_obitos, tema):
     df_prod_ano = df_p.groupby('ANO_FINAL').size().reset_index(name='Qtd_Produtos')
     df_prod_ano.rename(columns={'ANO_FINAL': 'Ano'}, inplace=True)
 
-    # --- 4. PROCESSAMENTO DE ÓBITOS (USANDO TOTAL_ANUAL) ---
+    # --- 4. PROCESSAMENTO DE ÓBITOS (TOTAL ANUAL) ---
+    # Soma de todos os meses da fato, inclusive mes = 0 (total anual sem distribuição mensal)
     if df_o.empty:
         df_obitos_ano = pd.DataFrame(columns=['Ano', 'Obitos'])
     else:
-        # Identifica Ano
-        col_ano_obito = next((c for c in ['ano_uid', 'ano', 'ano_nome'] if c in df_o.columns), None)
-        
-        if col_ano_obito:
-            df_o['Ano'] = df_o[col_ano_obito].astype(str).str.replace(r'\D', '', regex=True)
-            df_o['Ano'] = pd.to_numeric(df_o['Ano'], errors='coerce').fillna(0).astype(int)
-
-            # === AQUI ESTÁ A LÓGICA PEDIDA: USA COLUNA TOTAL_ANUAL ===
-            if 'total_anual' in df_o.columns:
-                # Converte para numérico para garantir a soma correta
-                df_o['Obitos'] = pd.to_numeric(df_o['total_anual'], errors='coerce').fillna(0)
-            else:
-                # Fallback: Se não existir total_anual, soma os meses
-                meses = ['janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho', 
-                         'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
-                cols_meses = [c for c in meses if c in df_o.columns]
-                df_o['Obitos'] = df_o[cols_meses].sum(axis=1) if cols_meses else 0
-            
-            # Agrupa por Ano (Soma o total de todos os registros daquele ano)
-            df_obitos_ano = df_o.groupby('Ano')['Obitos'].sum().reset_index()
-        else:
-            df_obitos_ano = pd.DataFrame(columns=['Ano', 'Obitos'])
+        df_obitos_ano = df_o.groupby('ano')['obitos'].sum().reset_index()
+        df_obitos_ano.columns = ['Ano', 'Obitos']
+        df_obitos_ano['Ano'] = df_obitos_ano['Ano'].astype(int)
 
     # --- 5. UNIFICAÇÃO E GRÁFICO ---
     df_final = pd.merge(df_prod_ano, df_obitos_ano, on='Ano', how='outer').fillna(0).sort_values('Ano')
@@ -1,265 +1,591 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from utils import html_card, padronizar_grafico, converter_csv
+import numpy as np
+import sys
+import threading
+from collections import OrderedDict
+from utils import (html_card, padronizar_grafico, converter_csv, settings, indexar_prf, filtrar_indice, renderizar_secao,
+                   carregar_dimensao_populacao, codigo_uf, codigo_municipio_prf, taxa_por_mil)
+import consultas_prf
+from geo_grade import NIVEIS_GRADE, celulas_geo, agregar_celulas
+import trechos_prf
 
-def render_prf(df, tema):
-    st.markdown("### 🚗 PRF - Monitoramento Avançado de Sinistros")
-    
-    if df.empty: 
-        st.error("⚠️ Base de dados vazia. Verifique a conexão.")
-        return
+# Tipos de veículo destacados na composição da frota (demais viram 'OUTROS')
+TOP_TIPOS = ['MOTOCICLETA', 'AUTOMÓVEL', 'CAMINHÃO', 'CAMINHONETE', 'ÔNIBUS', 'MOTONETA']
+MARCAS_EXCLUIR = ('NÃO INFORMADO', 'OUTRA', 'NI', 'NI/NI', 'S/M')
+# Ranking de letalidade: categoria -> (regex do TIPO_VEICULO, escala de cor)
+RANKINGS_LETALIDADE = {
+    "🏍️ Motos": ('MOTOCICLETA', 'Reds'),
+    "🛵 Motonetas": ('MOTONETA|CICLOMOTOR', 'Purples'),
+    "🚗 Carros": ('AUTOM|CARRO|CAMIONETA', 'Blues'),
+    "🚛 Pesados": ('CAMINH|TRATOR', 'Oranges'),
+    "🚌 Ônibus": ('ONIBUS|MICRO', 'Greens'),
+}
 
-    # --- BARRA LATERAL: FILTROS ---
+# ==============================================================================
+# FONTES DE AGREGAÇÃO
+# Os painéis consomem apenas tabelas pequenas; cada fonte sabe produzi-las
+# (pandas sobre o DataFrame filtrado, ou GROUP BY direto no banco).
+# ==============================================================================
+def _descategorizar(df):
+    """Converte colunas 'category' de uma tabela agregada (pequena) para texto."""
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype): df[c] = df[c].astype(str)
+    return df
+
+def _por_categoria(serie, teste):
+    """
+    Aplica 'teste' (vetorizado sobre um Index de textos) uma vez por categoria e
+    espalha o resultado para as linhas pelos códigos — sem criar strings por linha.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        por_cat = np.append(np.asarray(teste(serie.cat.categories.astype(str)), dtype=bool), False)  # código -1 (nulo) -> False
+        return por_cat[serie.cat.codes.to_numpy()]
+    return np.asarray(teste(pd.Index(serie.astype(str))), dtype=bool)
+
+def _fonte_memoria(df, linhas=None, grade=None, trechos=None):
+    """
+    Agregações calculadas em pandas sobre as linhas filtradas (posições 'linhas').
+    Só as colunas usadas por cada agregação são recortadas; sem filtro, a coluna
+    original é usada direto (sem cópia). 'grade' traz as células geográficas já
+    calculadas por linha ({nível: ids}) e 'trechos' o índice por rodovia
+    (trechos_prf.preparar_trechos); sem eles, são calculados na hora.
+    """
+    cache = {}
+    todas = linhas is None or len(linhas) == len(df)
+
+    def col(nome):
+        if nome not in cache: cache[nome] = df[nome] if todas else df[nome].take(linhas)
+        return cache[nome]
+
+    def kpis():
+        return {
+            'envolvidos': len(df) if todas else len(linhas),
+            'sinistros': col('ID').nunique() if 'ID' in df.columns else (len(df) if todas else len(linhas)),
+            'mortos': int(col('MORTOS').sum()),
+            'feridos': int(col('FERIDOS').sum()),
+        }
+
+    def contagem(coluna, limite=None, excluir=()):
+        s = col(coluna)
+        if excluir: s = s[~s.isin(excluir)]
+        vc = s.value_counts()
+        vc = vc[vc > 0]  # categorias sem ocorrência no filtro
+        if limite: vc = vc.head(limite)
+        return _descategorizar(vc.reset_index())
+
+    def distribuicao(coluna, minimo, maximo):
+        s = col(coluna)
+        return s[(s > minimo) & (s <= maximo)].value_counts().sort_index().reset_index()
+
+    def marcas_fatais(regex, marcas_excluir, limite=15):
+        if 'fatal' not in cache:
+            fatal = (col('MORTOS').to_numpy() > 0) | _por_categoria(col('ESTADO_FISICO'), lambda c: c.str.upper().isin(['ÓBITO', 'MORTO', 'FATAL']))
+            fatal &= ~_por_categoria(col('MARCA'), lambda c: c.str.upper().isin(marcas_excluir))
+            cache['fatal'] = fatal
+        mask = cache['fatal'] & _por_categoria(col('TIPO_VEICULO'), lambda c: c.str.upper().str.contains(regex))
+        vc = col('MARCA')[mask].value_counts()
+        return _descategorizar(vc[vc > 0].head(limite).reset_index())
+
+    def uf_tipo_veiculo():
+        return _descategorizar(pd.DataFrame({'UF': col('UF'), 'TIPO_VEICULO': col('TIPO_VEICULO')})
+                               .groupby(['UF', 'TIPO_VEICULO'], observed=True).size().reset_index(name='Qtd'))
+
+    def municipios():
+        return _descategorizar(pd.DataFrame({'MUNICIPIO': col('MUNICIPIO'), 'UF': col('UF')})
+                               .groupby(['MUNICIPIO', 'UF'], observed=True).size().reset_index(name='Qtd'))
+
+    def grade_geo(nivel):
+        tamanho = NIVEIS_GRADE[nivel][0]
+        if grade is not None:
+            celulas = grade[nivel] if todas else grade[nivel][linhas]
+        else:
+            celulas = celulas_geo(col('LAT').to_numpy(), col('LON').to_numpy(), tamanho)
+        return agregar_celulas(celulas, col('MORTOS').to_numpy(), tamanho)
+
+    def trechos_criticos(janela_km=1.0, peso='Qtd', limite=30):
+        # Seleções pequenas saem mais baratas ordenando só as linhas filtradas do que varrendo o índice
+        indice = trechos if todas or len(linhas) * 16 >= len(df) else None
+        if indice is None: indice = trechos_prf.preparar_trechos(col('UF'), col('BR'), col('KM'), col('MORTOS').to_numpy())
+        celulas, mortos = indice['celulas'], indice['mortos']
+        if indice is trechos and not todas:
+            # Marca as linhas do filtro e lê a marcação na ordem do índice: continua ordenado
+            marca = np.zeros(len(df), dtype=bool)
+            marca[linhas] = True
+            manter = marca[indice['ordem']]
+            celulas, mortos = celulas[manter], mortos[manter]
+        ids, qtd, obitos = trechos_prf.agregar_celulas(celulas, mortos)
+        return trechos_prf.trechos_criticos(ids, qtd, obitos, indice['ufs'], janela_km, limite, peso)
+
+    return {
+        'colunas': set(df.columns), 'kpis': kpis, 'contagem': contagem,
+        'distribuicao': distribuicao, 'marcas_fatais': marcas_fatais,
+        'uf_tipo_veiculo': uf_tipo_veiculo, 'municipios': municipios, 'grade_geo': grade_geo,
+        'trechos': trechos_criticos,
+    }
+
+# ==============================================================================
+# MEMO DOS FILTROS (MODO MEMÓRIA)
+# A base vem do estoque compartilhado (utils.dataset_aquecido) e a seleção da barra
+# lateral costuma se repetir entre reruns. Guardamos, por (versão da base, filtros),
+# as posições das linhas filtradas e cada agregação já calculada, num LRU com teto de
+# memória (settings.PRF_MEMO_MB) mantido em st.cache_resource.
+# ==============================================================================
+@st.cache_resource
+def _memo_prf():
+    return {'itens': OrderedDict(), 'bytes': 0, 'lock': threading.Lock()}
+
+def _tamanho(valor):
+    if isinstance(valor, pd.DataFrame): return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, np.ndarray): return valor.nbytes
+    return sys.getsizeof(valor)
+
+def _podar(memo):
+    """Remove as entradas menos usadas até caber no teto (a mais recente nunca sai)."""
+    limite = settings.PRF_MEMO_MB * 1024 ** 2
+    while memo['bytes'] > limite and len(memo['itens']) > 1:
+        _, antiga = memo['itens'].popitem(last=False)
+        memo['bytes'] -= antiga['bytes']
+
+def _memo_entrada(chave, calcular_linhas):
+    """Entrada do memo para a chave; calcula as linhas filtradas só na primeira vez."""
+    memo = _memo_prf()
+    with memo['lock']:
+        entrada = memo['itens'].get(chave)
+        if entrada is not None:
+            memo['itens'].move_to_end(chave)
+            return entrada
+    linhas = calcular_linhas()
+    entrada = {'chave': chave, 'linhas': linhas, 'agregados': {}, 'bytes': _tamanho(linhas)}
+    with memo['lock']:
+        # Outra sessão pode ter calculado a mesma chave enquanto isso: fica a dela (e a conta de bytes)
+        existente = memo['itens'].get(chave)
+        if existente is not None:
+            memo['itens'].move_to_end(chave)
+            return existente
+        memo['itens'][chave] = entrada
+        memo['bytes'] += entrada['bytes']
+        _podar(memo)
+    return entrada
+
+def _memo_guardar(entrada, chave, valor):
+    memo = _memo_prf()
+    tamanho = _tamanho(valor)
+    with memo['lock']:
+        if chave in entrada['agregados']: return
+        entrada['agregados'][chave] = valor
+        entrada['bytes'] += tamanho
+        # Se a entrada já foi despejada, o valor vale só para este rerun
+        if memo['itens'].get(entrada['chave']) is entrada:
+            memo['bytes'] += tamanho
+            _podar(memo)
+
+def _fonte_memorizada(df, entrada, grade=None, trechos=None):
+    """Fonte em memória cujas agregações passam pelo memo; as colunas filtradas só são recortadas se faltar algo."""
+    base = {}
+
+    def fonte():
+        if not base: base.update(_fonte_memoria(df, entrada['linhas'], grade, trechos))
+        return base
+
+    def memorizar(nome):
+        def chamada(*args, **kwargs):
+            chave = (nome, args, tuple(sorted(kwargs.items())))
+            valor = entrada['agregados'].get(chave)
+            if valor is None:
+                valor = fonte()[nome](*args, **kwargs)
+                _memo_guardar(entrada, chave, valor)
+            # Os painéis acrescentam colunas às tabelas recebidas: devolve cópia
+            return valor.copy()
+        return chamada
+
+    nomes = ('kpis', 'contagem', 'distribuicao', 'marcas_fatais', 'uf_tipo_veiculo', 'municipios', 'grade_geo', 'trechos')
+    return {'colunas': set(df.columns), **{nome: memorizar(nome) for nome in nomes}}
+
+@st.cache_resource(max_entries=2, show_spinner="Indexando base PRF...")
+def _indice_prf(versao, _df):
+    """Índice invertido da base PRF, montado uma vez por carga (versão)."""
+    return indexar_prf(_df)
+
+@st.cache_resource(max_entries=2)
+def _grade_prf(versao, _df):
+    """Célula geográfica de cada linha, por nível de zoom (int32; -1 sem coordenada)."""
+    if 'LAT' not in _df.columns or 'LON' not in _df.columns: return None
+    lat, lon = _df['LAT'].to_numpy(), _df['LON'].to_numpy()
+    return {nivel: celulas_geo(lat, lon, tamanho).astype(np.int32) for nivel, (tamanho, _, _) in NIVEIS_GRADE.items()}
+
+@st.cache_resource(max_entries=2)
+def _trechos_prf(versao, _df):
+    """Índice por rodovia (BR + KM) de todas as linhas, ordenado por célula de trecho."""
+    if not {'UF', 'BR', 'KM', 'MORTOS'} <= set(_df.columns): return None
+    return trechos_prf.preparar_trechos(_df['UF'], _df['BR'], _df['KM'], _df['MORTOS'].to_numpy())
+
+def _linhas_filtradas(df, indice, sel_anos, sel_ufs, sel_brs, sel_fisico):
+    """Posições (int) das linhas que passam nos filtros, por interseção no índice invertido."""
+    selecoes = {'ANO': sel_anos, 'UF': sel_ufs, 'BR': sel_brs, 'ESTADO_FISICO': sel_fisico}
+    return filtrar_indice(indice, len(df), {c: v for c, v in selecoes.items() if c in indice})
+
+def _fonte_sql(filtros):
+    """Agregações executadas como GROUP BY no MySQL (ver consultas_prf)."""
+    return {
+        'colunas': consultas_prf.COLUNAS_PERMITIDAS | {'LAT', 'LON', 'KM', 'ID', 'MORTOS', 'FERIDOS'},
+        'kpis': lambda: consultas_prf.kpis_prf(filtros),
+        'contagem': lambda coluna, limite=None, excluir=(): consultas_prf.contagem_prf(coluna, filtros, limite, tuple(excluir)),
+        'distribuicao': lambda coluna, minimo, maximo: consultas_prf.distribuicao_prf(coluna, filtros, minimo, maximo),
+        'marcas_fatais': lambda regex, marcas_excluir, limite=15: consultas_prf.marcas_fatais_prf(filtros, regex, tuple(marcas_excluir), limite),
+        'uf_tipo_veiculo': lambda: consultas_prf.uf_tipo_veiculo_prf(filtros),
+        'municipios': lambda: consultas_prf.municipios_prf(filtros),
+        'grade_geo': lambda nivel: consultas_prf.grade_geo_prf(filtros, nivel),
+        'trechos': lambda janela_km=1.0, peso='Qtd', limite=30: consultas_prf.trechos_prf(filtros, janela_km, peso, limite),
+    }
+
+def _tipo_frota(tipos):
+    """Mapeia cada tipo de veículo distinto para um dos TOP_TIPOS (ou 'OUTROS'), uma vez por valor."""
+    distintos = pd.Index(tipos.astype(str).unique())
+    maiusculo = distintos.str.upper()
+    grupo = np.where(maiusculo.str.contains('|'.join(TOP_TIPOS), regex=True), maiusculo, 'OUTROS')
+    return tipos.astype(str).map(dict(zip(distintos, grupo)))
+
+def _agrupar_frota(df_ut):
+    """Agrupa contagens (UF, TIPO_VEICULO, Qtd) nos tipos principais e mantém as 15 UFs com mais registros."""
+    df_ut = df_ut.assign(TIPO_V=_tipo_frota(df_ut['TIPO_VEICULO']))
+    top_ufs = df_ut.groupby('UF')['Qtd'].sum().sort_values(ascending=False).head(15).index
+    return df_ut[df_ut['UF'].isin(top_ufs)].groupby(['UF', 'TIPO_V'])['Qtd'].sum().reset_index()
+
+# ==============================================================================
+# BARRA LATERAL
+# ==============================================================================
+def _filtros_sidebar(anos, opcoes_fisico, ufs_list, brs_disponiveis):
+    """Desenha os filtros e devolve (sel_anos, tipo_metrica, sel_fisico, sel_ufs, sel_brs)."""
     st.sidebar.divider()
     st.sidebar.subheader("Filtros")
-    
+
     # 1. Ano
-    anos = sorted(df['ANO'].unique(), reverse=True)
     sel_anos = st.sidebar.multiselect("📅 Ano:", anos, default=[anos[0]] if anos else [])
-    
+
     # 2. Métrica de Visualização (SELETOR DE CORES/TIPO)
     # Aqui definimos as opções exatas que aparecem no filtro
     tipo_metrica = st.sidebar.radio("📊 Métrica dos Rankings:", ["Absoluto", "Taxa por 1.000 hab"])
 
     # 3. Estado Físico
-    if 'ESTADO_FISICO' in df.columns:
-        lista_fisico = [str(x) for x in df['ESTADO_FISICO'].unique() if pd.notna(x) and str(x).lower() != 'nan']
-        opcoes_fisico = sorted(lista_fisico)
+    if opcoes_fisico:
         sel_fisico = st.sidebar.multiselect("🏥 Estado Físico (Vítima):", opcoes_fisico, placeholder="Todos (Padrão)")
     else:
         sel_fisico = []
 
     # 4. Estado (UF)
-    ufs_list = sorted(df['UF'].astype(str).unique())
     sel_ufs = st.sidebar.multiselect("🗺️ Estado (UF):", ufs_list, placeholder="Todos (Brasil)")
 
-    # Filtragem preliminar
-    df_temp = df
-    if sel_anos: df_temp = df_temp[df_temp['ANO'].isin(sel_anos)]
-    if sel_ufs: df_temp = df_temp[df_temp['UF'].isin(sel_ufs)]
-    
-    # 5. Rodovia
-    brs_disponiveis = sorted(df_temp['BR'].astype(str).unique())
-    sel_brs = st.sidebar.multiselect("🛣️ Rodovia (BR):", brs_disponiveis[:200])
-
-    # --- APLICAÇÃO FINAL DOS FILTROS ---
-    df_f = df.copy()
-    if sel_anos: df_f = df_f[df_f['ANO'].isin(sel_anos)]
-    if sel_ufs: df_f = df_f[df_f['UF'].isin(sel_ufs)]
-    if sel_brs: df_f = df_f[df_f['BR'].astype(str).isin(sel_brs)]
-    if sel_fisico: df_f = df_f[df_f['ESTADO_FISICO'].astype(str).isin(sel_fisico)]
+    # 5. Rodovia (opções dependem de Ano/UF)
+    sel_brs = st.sidebar.multiselect("🛣️ Rodovia (BR):", brs_disponiveis(sel_anos, sel_ufs)[:200])
+
+    return sel_anos, tipo_metrica, sel_fisico, sel_ufs, sel_brs
+
+# ==============================================================================
+# PÁGINA
+# ==============================================================================
+def render_prf(df, tema):
+    """Modo memória: a base PRF completa já está carregada em um DataFrame."""
+    st.markdown("### 🚗 PRF - Monitoramento Avançado de Sinistros")
+
+    if df.empty:
+        st.error("⚠️ Base de dados vazia. Verifique a conexão.")
+        return
+
+    # --- BARRA LATERAL: FILTROS ---
+    anos = sorted(df['ANO'].unique(), reverse=True)
+    opcoes_fisico = []
+    if 'ESTADO_FISICO' in df.columns:
+        lista_fisico = [str(x) for x in df['ESTADO_FISICO'].unique() if pd.notna(x) and str(x).lower() != 'nan']
+        opcoes_fisico = sorted(lista_fisico)
+    ufs_list = sorted(str(x) for x in df['UF'].unique())
+
+    # Chave estável entre reruns: versão da carga + filtros normalizados
+    versao = df.attrs.get('versao_prf', len(df))
+    normalizar = lambda valores: tuple(sorted(str(v) for v in valores))
+    indice = _indice_prf(versao, df)
+
+    def brs_disponiveis(sel_anos, sel_ufs):
+        # Filtragem preliminar (memorizada por Ano/UF)
+        entrada = _memo_entrada((versao, 'brs', normalizar(sel_anos), normalizar(sel_ufs)),
+                                lambda: _linhas_filtradas(df, indice, sel_anos, sel_ufs, [], []))
+        if 'brs' not in entrada['agregados']:
+            brs = df['BR'].iloc[entrada['linhas']].unique()
+            _memo_guardar(entrada, 'brs', sorted(str(x) for x in brs))
+        return entrada['agregados']['brs']
 
+    sel_anos, tipo_metrica, sel_fisico, sel_ufs, sel_brs = _filtros_sidebar(anos, opcoes_fisico, ufs_list, brs_disponiveis)
+
+    # --- APLICAÇÃO FINAL DOS FILTROS (memorizada) ---
+    chave = (versao, 'filtros', normalizar(sel_anos), normalizar(sel_ufs), normalizar(sel_brs), normalizar(sel_fisico))
+    entrada = _memo_entrada(chave, lambda: _linhas_filtradas(df, indice, sel_anos, sel_ufs, sel_brs, sel_fisico))
+
+    _render_paineis(_fonte_memorizada(df, entrada, _grade_prf(versao, df), _trechos_prf(versao, df)), tipo_metrica, tema)
+
+def render_prf_sql(tema):
+    """Modo SQL: filtros e agregações rodam no banco; nenhuma linha individual é carregada."""
+    st.markdown("### 🚗 PRF - Monitoramento Avançado de Sinistros")
+
+    opcoes = consultas_prf.opcoes_filtros_prf()
+    if not opcoes['anos']:
+        st.error("⚠️ Base de dados vazia. Verifique a conexão.")
+        return
+
+    def brs_disponiveis(sel_anos, sel_ufs):
+        return consultas_prf.opcoes_br_prf(tuple(sel_anos), tuple(sel_ufs))
+
+    sel_anos, tipo_metrica, sel_fisico, sel_ufs, sel_brs = _filtros_sidebar(opcoes['anos'], opcoes['fisico'], opcoes['ufs'], brs_disponiveis)
+    filtros = (tuple(int(a) for a in sel_anos), tuple(sel_ufs), tuple(sel_brs), tuple(sel_fisico))
+
+    _render_paineis(_fonte_sql(filtros), tipo_metrica, tema)
+
+def _render_paineis(fonte, tipo_metrica, tema):
     # --- KPIs GERAIS ---
     k1, k2, k3, k4 = st.columns(4)
-    total_pessoas = len(df_f) 
-    total_sinistros = df_f['ID'].nunique() if 'ID' in df_f.columns else len(df_f)
-    mortos = int(df_f['MORTOS'].sum())
-    feridos = int(df_f['FERIDOS'].sum())
+    kpis = fonte['kpis']()
+    total_pessoas = kpis['envolvidos']
+    total_sinistros = kpis['sinistros']
+    mortos = kpis['mortos']
+    feridos = kpis['feridos']
     sev = (mortos / total_sinistros * 100) if total_sinistros > 0 else 0
-    
+
     with k1: st.markdown(html_card("Sinistros", f"{total_sinistros:,}", "Ocorrências Únicas", tema), unsafe_allow_html=True)
     with k2: st.markdown(html_card("Envolvidos", f"{total_pessoas:,}", "Total de Pessoas", tema), unsafe_allow_html=True)
     with k3: st.markdown(html_card("Óbitos", f"{mortos:,}", "Vítimas Fatais", tema), unsafe_allow_html=True)
     with k4: st.markdown(html_card("Índice Severidade", f"{sev:.1f}", "Mortos / 100 Sinistros", tema), unsafe_allow_html=True)
 
     st.divider()
-    
-    # --- ÁREA DE ANÁLISE ---
-    tabs = st.tabs(["👥 Perfil Vítimas", "🚗 Veículos & Frota", "📍 Localização & Taxas", "⚠️ Causas & Contexto", "🗺️ Mapa Geo"])
-    
-    # ABA 1: PERFIL VÍTIMAS
-    with tabs[0]:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.subheader("Gênero")
-            if 'SEXO' in df_f.columns:
-                df_s = df_f[~df_f['SEXO'].isin(['NÃO INFORMADO', 'Igno', 'Inválido'])]
-                if not df_s.empty:
-                    fig = px.pie(df_s['SEXO'].value_counts().reset_index(), values='count', names='SEXO', hole=0.5, color_discrete_sequence=px.colors.qualitative.Pastel)
-                    st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        with c2:
-            st.subheader("Estado Físico")
-            if 'ESTADO_FISICO' in df_f.columns:
-                df_e = df_f[~df_f['ESTADO_FISICO'].isin(['NÃO INFORMADO', 'Igno'])]
-                if not df_e.empty:
-                    fig = px.bar(df_e['ESTADO_FISICO'].value_counts().reset_index(), x='count', y='ESTADO_FISICO', orientation='h', text_auto=True, color='count', color_continuous_scale='Reds')
-                    fig.update_layout(yaxis=dict(autorange="reversed"))
-                    st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        
-        st.subheader("Distribuição Etária")
-        if 'IDADE' in df_f.columns:
-            df_i = df_f[(df_f['IDADE'] > 0) & (df_f['IDADE'] < 110)]
-            if not df_i.empty:
-                fig = px.histogram(df_i, x="IDADE", nbins=50, color_discrete_sequence=['#2196F3'], text_auto=True)
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
 
-    # ABA 2: VEÍCULOS & FROTA
-    with tabs[1]:
-        c_veic, c_ano = st.columns(2)
-        with c_veic:
-            st.subheader("Participação por Tipo de Veículo")
-            if 'TIPO_VEICULO' in df_f.columns:
-                top_v = df_f['TIPO_VEICULO'].value_counts().head(10).reset_index()
-                fig = px.bar(top_v, x='count', y='TIPO_VEICULO', orientation='h', text_auto=True, color='count')
-                fig.update_layout(yaxis=dict(autorange="reversed"))
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        with c_ano:
-            st.subheader("Idade da Frota")
-            if 'ANO_FABRICACAO_VEICULO' in df_f.columns:
-                df_ano = df_f[(df_f['ANO_FABRICACAO_VEICULO'] > 1980) & (df_f['ANO_FABRICACAO_VEICULO'] <= 2026)]
-                fig = px.histogram(df_ano, x="ANO_FABRICACAO_VEICULO", nbins=20, text_auto=True)
+    # --- ÁREA DE ANÁLISE (só a seção selecionada é calculada) ---
+    renderizar_secao({
+        "👥 Perfil Vítimas": _secao_perfil,
+        "🚗 Veículos & Frota": _secao_veiculos,
+        "📍 Localização & Taxas": _secao_localizacao,
+        "⚠️ Causas & Contexto": _secao_causas,
+        "🗺️ Mapa Geo": _secao_mapa,
+        "🛣️ Trechos Críticos": _secao_trechos,
+    }, 'prf_secao', fonte, tipo_metrica, tema)
+
+# SEÇÃO 1: PERFIL VÍTIMAS
+def _secao_perfil(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    c1, c2 = st.columns(2)
+    with c1:
+        st.subheader("Gênero")
+        if 'SEXO' in colunas:
+            df_s = fonte['contagem']('SEXO', excluir=('NÃO INFORMADO', 'Igno', 'Inválido'))
+            if not df_s.empty:
+                fig = px.pie(df_s, values='count', names='SEXO', hole=0.5, color_discrete_sequence=px.colors.qualitative.Pastel)
                 st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        
-        st.divider()
-        st.markdown("### ☠️ Ranking de Letalidade (Óbitos por Categoria)")
-        t_moto, t_motoneta, t_carro, t_pesado, t_bus = st.tabs(["🏍️ Motos", "🛵 Motonetas", "🚗 Carros", "🚛 Pesados", "🚌 Ônibus"])
-
-        if 'MARCA' in df_f.columns and 'TIPO_VEICULO' in df_f.columns:
-            df_fatal = df_f[(df_f['MORTOS'] > 0) | (df_f['ESTADO_FISICO'].astype(str).str.upper().isin(['ÓBITO', 'MORTO', 'FATAL']))].copy()
-            df_fatal = df_fatal[~df_fatal['MARCA'].astype(str).str.upper().isin(['NÃO INFORMADO', 'OUTRA', 'NI', 'NI/NI', 'S/M'])]
-
-            def plot_ranking(df_source, regex, cor):
-                mask = df_source['TIPO_VEICULO'].astype(str).str.upper().str.contains(regex)
-                ranking = df_source[mask]['MARCA'].value_counts().head(15).reset_index()
-                if ranking.empty: 
-                    st.info("Sem dados suficientes.")
-                    return
-                fig = px.bar(ranking, x='count', y='MARCA', orientation='h', text_auto=True, color='count', color_continuous_scale=cor)
+    with c2:
+        st.subheader("Estado Físico")
+        if 'ESTADO_FISICO' in colunas:
+            df_e = fonte['contagem']('ESTADO_FISICO', excluir=('NÃO INFORMADO', 'Igno'))
+            if not df_e.empty:
+                fig = px.bar(df_e, x='count', y='ESTADO_FISICO', orientation='h', text_auto=True, color='count', color_continuous_scale='Reds')
                 fig.update_layout(yaxis=dict(autorange="reversed"))
                 st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
 
-            with t_moto: plot_ranking(df_fatal, 'MOTOCICLETA', 'Reds')
-            with t_motoneta: plot_ranking(df_fatal, 'MOTONETA|CICLOMOTOR', 'Purples')
-            with t_carro: plot_ranking(df_fatal, 'AUTOM|CARRO|CAMIONETA', 'Blues')
-            with t_pesado: plot_ranking(df_fatal, 'CAMINH|TRATOR', 'Oranges')
-            with t_bus: plot_ranking(df_fatal, 'ONIBUS|MICRO', 'Greens')
-
-    # ABA 3: LOCALIZAÇÃO & TAXAS (CORES CORRIGIDAS)
-    with tabs[2]:
-        # --- LÓGICA DE CORES ---
-        # Se for Absoluto -> AZUL
-        # Se for Taxa -> VERMELHO
-        if tipo_metrica == "Absoluto":
-            cor_ranking = 'Blues'
-        else:
-            cor_ranking = 'Reds'
-
-        # Carregamento de População
-        df_pop = pd.DataFrame()
-        if tipo_metrica == "Taxa por 1.000 hab":
-            from utils import carregar_populacao
-            df_pop = carregar_populacao()
-            if df_pop.empty:
-                st.warning("⚠️ Dados de população não disponíveis. Mostrando Absoluto.")
-                tipo_metrica = "Absoluto"
-                cor_ranking = 'Blues' # Fallback para azul
-
-        # 1. Gráfico Empilhado (Estados x Veículos)
-        st.markdown("##### 🚗 Composição da Frota Acidentada por UF")
-        if 'TIPO_VEICULO' in df_f.columns:
-            top_tipos = ['MOTOCICLETA', 'AUTOMÓVEL', 'CAMINHÃO', 'CAMINHONETE', 'ÔNIBUS', 'MOTONETA']
-            df_s = df_f.copy()
-            df_s['TIPO_V'] = df_s['TIPO_VEICULO'].str.upper()
-            df_s.loc[~df_s['TIPO_V'].apply(lambda x: any(t in str(x) for t in top_tipos)), 'TIPO_V'] = 'OUTROS'
-            top_ufs = df_s['UF'].value_counts().head(15).index
-            df_g = df_s[df_s['UF'].isin(top_ufs)].groupby(['UF', 'TIPO_V']).size().reset_index(name='Qtd')
-            fig_s = px.bar(df_g, x='Qtd', y='UF', color='TIPO_V', orientation='h', barmode='stack')
-            fig_s.update_layout(yaxis=dict(autorange="reversed"))
-            st.plotly_chart(padronizar_grafico(fig_s, tema), use_container_width=True)
-
-        st.divider()
-        
-        # --- RANKING DE ESTADOS (COR CONDICIONAL) ---
-        st.markdown(f"### 🗺️ Ranking por Estado ({tipo_metrica})")
-        df_uf = df_f['UF'].value_counts().reset_index(name='Qtd').rename(columns={'index':'UF'})
-        
-        if tipo_metrica == "Taxa por 1.000 hab" and not df_pop.empty:
-            pop_uf = df_pop.groupby('uf_norm')['populacao'].sum().reset_index()
-            df_m = pd.merge(df_uf, pop_uf, left_on='UF', right_on='uf_norm')
-            df_m['Valor'] = (df_m['Qtd'] / df_m['populacao']) * 1000
-            
-            # TAXA = VERMELHO ('Reds')
-            fig = px.bar(df_m.sort_values('Valor', ascending=False).head(30), x='Valor', y='UF', orientation='h', 
-                         text_auto='.2f', color='Valor', color_continuous_scale=cor_ranking, height=700)
-        else:
-            # ABSOLUTO = AZUL ('Blues')
-            fig = px.bar(df_uf.head(30), x='Qtd', y='UF', orientation='h', 
-                         text_auto=True, color='Qtd', color_continuous_scale=cor_ranking, height=700)
-        
-        fig.update_layout(yaxis=dict(autorange="reversed"))
-        st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-
-        st.divider()
-
-        # --- RANKING DE MUNICÍPIOS (COR CONDICIONAL) ---
-        st.markdown(f"### 🏙️ Ranking de Municípios ({tipo_metrica})")
-        df_m_c = df_f.groupby(['MUNICIPIO', 'UF']).size().reset_index(name='Qtd')
-        
-        if tipo_metrica == "Taxa por 1.000 hab" and not df_pop.empty:
-            df_m_c['mun_n'] = df_m_c['MUNICIPIO'].str.upper().str.strip()
-            df_m2 = pd.merge(df_m_c, df_pop, left_on=['mun_n', 'UF'], right_on=['municipio_norm', 'uf_norm'])
-            df_m2 = df_m2[df_m2['populacao'] > 5000] # Filtra cidades muito pequenas
-            df_m2['Valor'] = (df_m2['Qtd'] / df_m2['populacao']) * 1000
-            df_m2['Label'] = df_m2['MUNICIPIO'] + "-" + df_m2['UF']
-            
-            # TAXA = VERMELHO ('Reds')
-            fig = px.bar(df_m2.sort_values('Valor', ascending=False).head(30), x='Valor', y='Label', orientation='h', 
-                         text_auto='.2f', color='Valor', color_continuous_scale=cor_ranking, height=800)
+    st.subheader("Distribuição Etária")
+    if 'IDADE' in colunas:
+        df_i = fonte['distribuicao']('IDADE', 0, 109)
+        if not df_i.empty:
+            fig = px.histogram(df_i, x="IDADE", y='count', histfunc='sum', nbins=50, color_discrete_sequence=['#2196F3'], text_auto=True)
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+# SEÇÃO 2: VEÍCULOS & FROTA
+def _secao_veiculos(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    c_veic, c_ano = st.columns(2)
+    with c_veic:
+        st.subheader("Participação por Tipo de Veículo")
+        if 'TIPO_VEICULO' in colunas:
+            top_v = fonte['contagem']('TIPO_VEICULO', limite=10)
+            fig = px.bar(top_v, x='count', y='TIPO_VEICULO', orientation='h', text_auto=True, color='count')
+            fig.update_layout(yaxis=dict(autorange="reversed"))
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+    with c_ano:
+        st.subheader("Idade da Frota")
+        if 'ANO_FABRICACAO_VEICULO' in colunas:
+            df_ano = fonte['distribuicao']('ANO_FABRICACAO_VEICULO', 1980, 2026)
+            fig = px.histogram(df_ano, x="ANO_FABRICACAO_VEICULO", y='count', histfunc='sum', nbins=20, text_auto=True)
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+    st.divider()
+    st.markdown("### ☠️ Ranking de Letalidade (Óbitos por Categoria)")
+    # Uma categoria por vez (em vez de 5 abas calculadas a cada rerun)
+    categoria = st.radio("Categoria:", list(RANKINGS_LETALIDADE), horizontal=True, key='prf_letalidade')
+
+    if 'MARCA' in colunas and 'TIPO_VEICULO' in colunas:
+        def plot_ranking(regex, cor):
+            ranking = fonte['marcas_fatais'](regex, MARCAS_EXCLUIR)
+            if ranking.empty:
+                st.info("Sem dados suficientes.")
+                return
+            fig = px.bar(ranking, x='count', y='MARCA', orientation='h', text_auto=True, color='count', color_continuous_scale=cor)
+            fig.update_layout(yaxis=dict(autorange="reversed"))
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+        plot_ranking(*RANKINGS_LETALIDADE[categoria])
+
+# SEÇÃO 3: LOCALIZAÇÃO & TAXAS (CORES CORRIGIDAS)
+def _secao_localizacao(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    # --- LÓGICA DE CORES ---
+    # Se for Absoluto -> AZUL
+    # Se for Taxa -> VERMELHO
+    if tipo_metrica == "Absoluto":
+        cor_ranking = 'Blues'
+    else:
+        cor_ranking = 'Reds'
+
+    # Dimensão de população (carregada uma vez por processo)
+    usar_taxa = tipo_metrica == "Taxa por 1.000 hab"
+    if usar_taxa:
+        dim_pop = carregar_dimensao_populacao()
+        usar_taxa = not dim_pop['municipios'].empty
+        if not usar_taxa:
+            st.warning("⚠️ Dados de população não disponíveis. Mostrando Absoluto.")
+            tipo_metrica = "Absoluto"
+            cor_ranking = 'Blues' # Fallback para azul
+
+    # 1. Gráfico Empilhado (Estados x Veículos)
+    st.markdown("##### 🚗 Composição da Frota Acidentada por UF")
+    if 'TIPO_VEICULO' in colunas:
+        df_g = _agrupar_frota(fonte['uf_tipo_veiculo']())
+        fig_s = px.bar(df_g, x='Qtd', y='UF', color='TIPO_V', orientation='h', barmode='stack')
+        fig_s.update_layout(yaxis=dict(autorange="reversed"))
+        st.plotly_chart(padronizar_grafico(fig_s, tema), use_container_width=True)
+
+    st.divider()
+
+    # --- RANKING DE ESTADOS (COR CONDICIONAL) ---
+    st.markdown(f"### 🗺️ Ranking por Estado ({tipo_metrica})")
+    df_uf = fonte['contagem']('UF').rename(columns={'count': 'Qtd'})
+
+    if usar_taxa:
+        df_m = taxa_por_mil(df_uf, 'Qtd', codigo_uf(df_uf['UF']), nivel='uf')
+
+        # TAXA = VERMELHO ('Reds')
+        fig = px.bar(df_m.sort_values('Valor', ascending=False).head(30), x='Valor', y='UF', orientation='h',
+                     text_auto='.2f', color='Valor', color_continuous_scale=cor_ranking, height=700)
+    else:
+        # ABSOLUTO = AZUL ('Blues')
+        fig = px.bar(df_uf.head(30), x='Qtd', y='UF', orientation='h',
+                     text_auto=True, color='Qtd', color_continuous_scale=cor_ranking, height=700)
+
+    fig.update_layout(yaxis=dict(autorange="reversed"))
+    st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+    st.divider()
+
+    # --- RANKING DE MUNICÍPIOS (COR CONDICIONAL) ---
+    st.markdown(f"### 🏙️ Ranking de Municípios ({tipo_metrica})")
+    df_m_c = fonte['municipios']()
+
+    if usar_taxa:
+        # Grafias diferentes da PRF podem cair no mesmo id_ibge: soma por cidade (rótulo = grafia mais frequente)
+        df_cid = (df_m_c.assign(id_ibge=codigo_municipio_prf(df_m_c['MUNICIPIO'], df_m_c['UF']))
+                  .query('id_ibge >= 0').sort_values('Qtd', ascending=False)
+                  .groupby('id_ibge', as_index=False, sort=False)
+                  .agg(MUNICIPIO=('MUNICIPIO', 'first'), UF=('UF', 'first'), Qtd=('Qtd', 'sum')))
+        df_m2 = taxa_por_mil(df_cid, 'Qtd', df_cid['id_ibge'], nivel='municipio', pop_minima=5000)  # Filtra cidades muito pequenas
+        df_m2['Label'] = df_m2['MUNICIPIO'] + "-" + df_m2['UF']
+
+        # TAXA = VERMELHO ('Reds')
+        fig = px.bar(df_m2.sort_values('Valor', ascending=False).head(30), x='Valor', y='Label', orientation='h',
+                     text_auto='.2f', color='Valor', color_continuous_scale=cor_ranking, height=800)
+    else:
+        df_m_c['Label'] = df_m_c['MUNICIPIO'] + "-" + df_m_c['UF']
+        # ABSOLUTO = AZUL ('Blues')
+        fig = px.bar(df_m_c.sort_values('Qtd', ascending=False).head(30), x='Qtd', y='Label', orientation='h',
+                     text_auto=True, color='Qtd', color_continuous_scale=cor_ranking, height=800)
+
+    fig.update_layout(yaxis=dict(autorange="reversed"))
+    st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+# SEÇÃO 4: CAUSAS
+def _secao_causas(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    c1, c2 = st.columns(2)
+    with c1:
+        st.subheader("Causa Principal")
+        if 'CAUSA_PRINCIPAL' in colunas:
+            top_c = fonte['contagem']('CAUSA_PRINCIPAL', limite=10)
+            fig = px.bar(top_c, x='count', y='CAUSA_PRINCIPAL', orientation='h', text_auto=True, color='count')
+            fig.update_layout(yaxis=dict(autorange="reversed"))
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+    with c2:
+        st.subheader("Condição Meteorológica")
+        if 'CONDICAO_METEREOLOGICA' in colunas:
+            fig = px.pie(fonte['contagem']('CONDICAO_METEREOLOGICA'), values='count', names='CONDICAO_METEREOLOGICA', hole=0.5)
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+    c_f, c_p = st.columns(2)
+    with c_f:
+        st.subheader("Fase do Dia")
+        if 'FASE_DIA' in colunas:
+            fig = px.pie(fonte['contagem']('FASE_DIA'), values='count', names='FASE_DIA', hole=0.5)
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+    with c_p:
+        st.subheader("Tipo de Pista")
+        if 'TIPO_PISTA' in colunas:
+            fig = px.bar(fonte['contagem']('TIPO_PISTA'), x='count', y='TIPO_PISTA', orientation='h', text_auto=True)
+            fig.update_layout(yaxis=dict(autorange="reversed"))
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+
+# SEÇÃO 5: MAPA (COM ZOOM E LINHAS)
+def _secao_mapa(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    st.subheader("Mapa de Calor (Ocorrências por Célula)")
+    if 'LAT' in colunas and 'LON' in colunas:
+        c_nivel, c_peso = st.columns(2)
+        nivel = c_nivel.radio("Grade:", list(NIVEIS_GRADE), horizontal=True, key='prf_geo_nivel')
+        peso = c_peso.radio("Peso:", ["Ocorrências", "Óbitos"], horizontal=True, key='prf_geo_peso')
+        tamanho, zoom, raio = NIVEIS_GRADE[nivel]
+
+        grade = fonte['grade_geo'](nivel)
+        z = 'Qtd' if peso == "Ocorrências" else 'Mortos'
+        grade = grade[grade[z] > 0]
+        if not grade.empty:
+            st.caption(f"{len(grade):,} células de {tamanho}° com {int(grade['Qtd'].sum()):,} ocorrências "
+                       f"e {int(grade['Mortos'].sum()):,} óbitos.")
+
+            # Mapa estilo Open Street Map com Zoom habilitado
+            fig_map = px.density_mapbox(
+                grade, lat='LAT', lon='LON', z=z, radius=raio, zoom=zoom,
+                hover_data={'Qtd': True, 'Mortos': True, 'LAT': ':.2f', 'LON': ':.2f'},
+                center=dict(lat=-15.78, lon=-47.92),
+                mapbox_style="open-street-map"
+            )
+            fig_map.update_layout(height=600, margin={"r":0,"t":0,"l":0,"b":0})
+            st.plotly_chart(fig_map, use_container_width=True, config={'scrollZoom': True})
         else:
-            df_m_c['Label'] = df_m_c['MUNICIPIO'] + "-" + df_m_c['UF']
-            # ABSOLUTO = AZUL ('Blues')
-            fig = px.bar(df_m_c.sort_values('Qtd', ascending=False).head(30), x='Qtd', y='Label', orientation='h', 
-                         text_auto=True, color='Qtd', color_continuous_scale=cor_ranking, height=800)
-        
-        fig.update_layout(yaxis=dict(autorange="reversed"))
-        st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-
-    # ABA 4: CAUSAS
-    with tabs[3]:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.subheader("Causa Principal")
-            if 'CAUSA_PRINCIPAL' in df_f.columns:
-                top_c = df_f['CAUSA_PRINCIPAL'].value_counts().head(10).reset_index()
-                fig = px.bar(top_c, x='count', y='CAUSA_PRINCIPAL', orientation='h', text_auto=True, color='count')
-                fig.update_layout(yaxis=dict(autorange="reversed"))
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        with c2:
-            st.subheader("Condição Meteorológica")
-            if 'CONDICAO_METEREOLOGICA' in df_f.columns:
-                fig = px.pie(df_f['CONDICAO_METEREOLOGICA'].value_counts().reset_index(), values='count', names='CONDICAO_METEREOLOGICA', hole=0.5)
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        
-        c_f, c_p = st.columns(2)
-        with c_f:
-            st.subheader("Fase do Dia")
-            if 'FASE_DIA' in df_f.columns:
-                fig = px.pie(df_f['FASE_DIA'].value_counts().reset_index(), values='count', names='FASE_DIA', hole=0.5)
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
-        with c_p:
-            st.subheader("Tipo de Pista")
-            if 'TIPO_PISTA' in df_f.columns:
-                fig = px.bar(df_f['TIPO_PISTA'].value_counts().reset_index(), x='count', y='TIPO_PISTA', orientation='h', text_auto=True)
-                fig.update_layout(yaxis=dict(autorange="reversed"))
-                st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+            st.warning("Sem coordenadas válidas registradas.")
 
-    # ABA 5: MAPA (COM ZOOM E LINHAS)
-    with tabs[4]:
-        st.subheader("Mapa de Calor (Densidade de Ocorrências)")
-        if 'LAT' in df_f.columns and 'LON' in df_f.columns:
-            coords = df_f[(df_f['LAT'] != 0) & (df_f['LON'] != 0)]
-            if not coords.empty:
-                if len(coords) > 20000: coords = coords.sample(20000)
-                st.caption(f"Exibindo amostra de {len(coords):,} pontos georreferenciados.")
-                
-                # Mapa estilo Open Street Map com Zoom habilitado
-                fig_map = px.density_mapbox(
-                    coords, lat='LAT', lon='LON', radius=10, zoom=3, 
-                    center=dict(lat=-15.78, lon=-47.92),
-                    mapbox_style="open-street-map"
-                )
-                fig_map.update_layout(height=600, margin={"r":0,"t":0,"l":0,"b":0})
-                st.plotly_chart(fig_map, use_container_width=True, config={'scrollZoom': True})
-            else: 
-                st.warning("Sem coordenadas válidas registradas.")
\ No newline at end of file
+# SEÇÃO 6: TRECHOS CRÍTICOS (JANELA DESLIZANTE POR BR + KM)
+def _secao_trechos(fonte, tipo_metrica, tema):
+    colunas = fonte['colunas']
+    st.subheader("Trechos Críticos das Rodovias")
+    if {'UF', 'BR', 'KM'} <= colunas:
+        c_janela, c_peso = st.columns(2)
+        janela = c_janela.slider("Extensão do trecho (km):", 0.5, 5.0, 1.0, 0.5, key='prf_trecho_janela')
+        peso = c_peso.radio("Ordenar por:", ["Ocorrências", "Óbitos"], horizontal=True, key='prf_trecho_peso')
+
+        df_tr = fonte['trechos'](janela, 'Qtd' if peso == "Ocorrências" else 'Mortos')
+        if not df_tr.empty:
+            df_tr['Trecho'] = ("BR-" + df_tr['BR'].astype(int).astype(str).str.zfill(3) + "/" + df_tr['UF'].astype(str)
+                               + " km " + df_tr['KM_INICIO'].map('{:.1f}'.format) + "–" + df_tr['KM_FIM'].map('{:.1f}'.format))
+            x = 'Qtd' if peso == "Ocorrências" else 'Mortos'
+            st.caption(f"Janelas de {janela:.1f} km sem sobreposição na mesma rodovia; posição lida do KM registrado pela PRF.")
+            fig = px.bar(df_tr.head(20), x=x, y='Trecho', orientation='h', text_auto=True,
+                         hover_data={'Qtd': True, 'Mortos': True}, color=x, color_continuous_scale='Reds')
+            fig.update_layout(yaxis=dict(autorange="reversed"), height=600)
+            st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True)
+            st.dataframe(df_tr[['Trecho', 'UF', 'BR', 'KM_INICIO', 'KM_FIM', 'Qtd', 'Mortos']], use_container_width=True, hide_index=True)
+            st.download_button("📥 Baixar Trechos (CSV)", converter_csv(df_tr), "trechos_criticos_prf.csv", key='prf_trecho_csv')
+        else:
+            st.warning("Sem BR/KM válidos para os filtros selecionados.")
+    else:
+        st.warning("Colunas de BR/KM indisponíveis.")
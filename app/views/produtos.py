@@ -85,6 +85,7 @@ def render_visao_geral(df_mapa, df_org, df_prod, df_status, tema, df_mun, df_use
                 fig.update_layout(height=500, margin={"r":0,"t":0,"l":0,"b":0}, dragmode=False)
                 st.plotly_chart(padronizar_grafico(fig, tema), use_container_width=True, config={'scrollZoom': False, 'displayModeBar': False})
             else: st.info("Sem dados para o mapa.")
+        except FileNotFoundError as e: st.warning(f"🗺️ {e}")
         except: st.warning("Carregando mapa...")
 
     with c_status:
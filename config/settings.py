@@ -30,3 +30,42 @@ CACHE_TTL = 300
 
 # --- DEBUG ---
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+# --- POOL DE CONEXÕES (Engine compartilhada do Dashboard) ---
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+# --- MODO DA PÁGINA PRF ---
+# 'memoria': carrega acidentes_prf inteiro no processo | 'sql': filtros e agregações rodam no banco
+# 'auto': usa 'sql' quando o cubo PRF (prf_cubo*) já foi materializado pelo ETL
+PRF_MODO = os.getenv('PRF_MODO', 'auto').lower()
+
+# --- SNAPSHOTS PARQUET (gerados pelos ETLs em scripts/snapshot.py) ---
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+
+# --- MEMO DOS FILTROS DA PÁGINA PRF (modo memória) ---
+# Teto de memória do cache LRU de linhas filtradas + agregações (compartilhado entre sessões)
+PRF_MEMO_MB = int(os.getenv('PRF_MEMO_MB', '256'))
+
+# --- MALHA DOS ESTADOS (GeoJSON local + variantes simplificadas, ver scripts/preparar_geojson.py) ---
+GEO_DIR = os.getenv('GEO_DIR', os.path.join(BASE_DIR, 'assets', 'geo'))
+# Variante usada nos mapas coropléticos: original | detalhado | medio | leve
+GEO_VARIANTE = os.getenv('GEO_VARIANTE', 'medio')
+# A malha vem de scripts/preparar_geojson.py (rodado na build da imagem). Baixar em tempo de
+# execução quando não houver cópia local é opcional (ex: desenvolvimento local sem a build)
+GEO_DOWNLOAD = os.getenv('GEO_DOWNLOAD', 'False').lower() == 'true'
+
+# --- VERSÕES DOS DATASETS (tabela dataset_versao, carimbada pelos ETLs) ---
+# Intervalo (s) entre consultas aos carimbos: prazo máximo para uma carga nova aparecer no Dashboard
+VERSAO_TTL = int(os.getenv('VERSAO_TTL', '30'))
+
+# --- AQUECIMENTO EM SEGUNDO PLANO (PRF e Óbitos) ---
+# Intervalo (s) entre verificações de versão da thread que recarrega os datasets pesados
+AQUECIMENTO_INTERVALO = int(os.getenv('AQUECIMENTO_INTERVALO', '60'))
+
+# --- ESTOQUE COMPARTILHADO ENTRE RÉPLICAS (Arrow IPC mapeado, ver app/dataset_compartilhado.py) ---
+# Opcional: pasta local vista por todas as réplicas da máquina (disco local ou /dev/shm).
+# Vazio (padrão) = cada réplica carrega a sua cópia privada, como antes
+COMPARTILHADO_DIR = os.getenv('COMPARTILHADO_DIR', '')
@@ -0,0 +1,307 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+# Permite importar os módulos do Dashboard (app/)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'app'))
+
+from utils import (limpar_coordenadas, extrair_hora, limpar_coordenadas_serie, extrair_hora_serie,
+                   indexar_prf, filtrar_indice)
+import trechos_prf
+import dataset_compartilhado
+from geo_grade import NIVEIS_GRADE, celulas_geo
+
+# --- AUXILIARES ---
+def cronometrar(func):
+    inicio = time.perf_counter()
+    resultado = func()
+    return resultado, time.perf_counter() - inicio
+
+def mesmos_valores(a, b):
+    """Compara duas séries tratando None/NaN como equivalentes."""
+    a = pd.to_numeric(a, errors='coerce').to_numpy(dtype='float64')
+    b = pd.to_numeric(b, errors='coerce').to_numpy(dtype='float64')
+    return bool(np.array_equal(a, b, equal_nan=True))
+
+# ==============================================================================
+# 1. PARSING DE COORDENADAS E HORÁRIOS
+# ==============================================================================
+def gerar_textos_prf(n, seed=0):
+    """Latitudes com vírgula decimal e horários HH:MM:SS, com ~1% de valores inválidos."""
+    rng = np.random.default_rng(seed)
+    lat = pd.Series(np.char.replace(np.round(rng.uniform(-33, 5, n), 6).astype(str), '.', ','), dtype=object)
+    horas = rng.integers(0, 24, n)
+    minutos = rng.integers(0, 60, n)
+    horario = pd.Series([f"{h:02d}:{m:02d}:00" for h, m in zip(horas, minutos)], dtype=object)
+    invalidos = rng.random(n) < 0.01
+    lat[invalidos] = 'NA'
+    horario[invalidos] = ''
+    return lat, horario
+
+def bench_parsing(linhas):
+    print("\n--- PARSING PRF: apply (linha a linha) vs vetorizado ---")
+    for n in linhas:
+        lat, horario = gerar_textos_prf(n)
+
+        ref, t_apply = cronometrar(lambda: lat.apply(limpar_coordenadas))
+        vet, t_vet = cronometrar(lambda: limpar_coordenadas_serie(lat))
+        ok = "✓" if mesmos_valores(ref, vet) else "DIVERGENTE"
+        print(f"  {n:>10,} linhas | coordenadas: apply {t_apply:6.2f}s | vetorizado {t_vet:6.2f}s | {t_apply / t_vet:5.1f}x {ok}")
+
+        ref, t_apply = cronometrar(lambda: horario.apply(extrair_hora))
+        vet, t_vet = cronometrar(lambda: extrair_hora_serie(horario))
+        ok = "✓" if mesmos_valores(ref, vet) else "DIVERGENTE"
+        print(f"  {n:>10,} linhas | horário:     apply {t_apply:6.2f}s | vetorizado {t_vet:6.2f}s | {t_apply / t_vet:5.1f}x {ok}")
+
+# ==============================================================================
+# 2. FILTROS: CADEIA DE .isin() vs ÍNDICE INVERTIDO
+# ==============================================================================
+def gerar_base_prf(n, seed=0):
+    """Base sintética com as dimensões filtráveis já em 'category' (como após compactar_prf)."""
+    rng = np.random.default_rng(seed)
+    ufs = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+           'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+    cat = lambda valores, p=None: pd.Categorical.from_codes(rng.choice(len(valores), n, p=p), valores)
+    return pd.DataFrame({
+        'ANO': rng.integers(2017, 2026, n).astype('int16'),
+        'UF': cat(ufs),
+        'BR': cat([str(b) for b in range(10, 500)]),
+        'ESTADO_FISICO': cat(['Ileso', 'Lesões Leves', 'Lesões Graves', 'Óbito', 'NÃO INFORMADO'], [0.5, 0.3, 0.1, 0.05, 0.05]),
+        'MUNICIPIO': cat([f"MUNICIPIO {i}" for i in range(2000)]),
+        'TIPO_VEICULO': cat(['Automóvel', 'Motocicleta', 'Caminhão', 'Ônibus', 'Caminhonete', 'Bicicleta']),
+        'MORTOS': rng.integers(0, 2, n).astype('int8'),
+    })
+
+def filtrar_isin(df, anos, ufs, brs, fisico):
+    """Filtragem como era feita em render_prf: cópia + .isin() encadeado."""
+    df_f = df.copy()
+    if anos: df_f = df_f[df_f['ANO'].isin(anos)]
+    if ufs: df_f = df_f[df_f['UF'].isin(ufs)]
+    if brs: df_f = df_f[df_f['BR'].astype(str).isin(brs)]
+    if fisico: df_f = df_f[df_f['ESTADO_FISICO'].isin(fisico)]
+    return df_f.index.to_numpy()
+
+def bench_filtros(linhas, repeticoes=5):
+    print("\n--- FILTROS PRF: .isin() encadeado vs índice invertido ---")
+    cenarios = {
+        '1 ano': ([2024], [], [], []),
+        '2 anos + UF': ([2023, 2024], ['SP'], [], []),
+        'ano + 3 UFs + BR': ([2024], ['SP', 'MG', 'RJ'], ['116', '101'], []),
+        'todos os filtros': ([2022, 2024], ['SP', 'PR'], ['116'], ['Óbito']),
+        'só Estado Físico': ([], [], [], ['Óbito', 'Lesões Graves']),
+    }
+    for n in linhas:
+        df = gerar_base_prf(n)
+        indice, t_idx = cronometrar(lambda: indexar_prf(df))
+        mb = sum(p.nbytes for col in indice.values() for p in col.values()) / 1024 ** 2
+        print(f"  {n:>10,} linhas | índice montado em {t_idx:.2f}s ({mb:,.0f} MB)")
+        for nome, (anos, ufs, brs, fisico) in cenarios.items():
+            ref = filtrar_isin(df, anos, ufs, brs, fisico)
+            selecoes = {'ANO': anos, 'UF': ufs, 'BR': brs, 'ESTADO_FISICO': fisico}
+            idx = filtrar_indice(indice, len(df), selecoes)
+            ok = "✓" if np.array_equal(ref, idx) else "DIVERGENTE"
+            t_isin = min(cronometrar(lambda: filtrar_isin(df, anos, ufs, brs, fisico))[1] for _ in range(repeticoes))
+            t_ind = min(cronometrar(lambda: filtrar_indice(indice, len(df), selecoes))[1] for _ in range(repeticoes))
+            print(f"    {nome:<18} {len(idx):>10,} linhas | isin {t_isin * 1000:8.1f} ms | índice {t_ind * 1000:7.2f} ms | {t_isin / t_ind:6.1f}x {ok}")
+
+# ==============================================================================
+# 3. PICO DE MEMÓRIA DO render_prf (tracemalloc)
+# ==============================================================================
+def gerar_base_completa_prf(n, seed=0):
+    """Base sintética com as colunas usadas pelos painéis, nos tipos de compactar_prf."""
+    rng = np.random.default_rng(seed)
+    df = gerar_base_prf(n, seed)
+    cat = lambda valores: pd.Categorical.from_codes(rng.choice(len(valores), n), valores)
+    df['ID'] = rng.integers(0, n // 3, n).astype('int32')
+    df['FERIDOS'] = rng.integers(0, 3, n).astype('int8')
+    df['IDADE'] = rng.integers(0, 100, n).astype('int8')
+    df['ANO_FABRICACAO_VEICULO'] = rng.integers(1980, 2026, n).astype('int16')
+    df['SEXO'] = cat(['Masculino', 'Feminino', 'NÃO INFORMADO'])
+    df['MARCA'] = cat([f"MARCA {i}" for i in range(300)] + ['NÃO INFORMADO'])
+    for c in ['CAUSA_PRINCIPAL', 'CONDICAO_METEREOLOGICA', 'FASE_DIA', 'TIPO_PISTA',
+              'DIA_SEMANA', 'TIPO_ACIDENTE', 'CLASSIFICACAO_ACIDENTE', 'SENTIDO_VIA', 'TRACADO_VIA', 'USO_SOLO']:
+        df[c] = cat([f"{c} {i}" for i in range(20)])
+    df['LAT'] = rng.uniform(-33, 5, n).astype('float32')
+    df['LON'] = rng.uniform(-73, -35, n).astype('float32')
+    return df
+
+def paineis_antigos(df, anos, ufs):
+    """Reprodução das alocações do render_prf original: cópia da base, df_fatal.copy() e cópia + apply na frota."""
+    df_f = df.copy()
+    if anos: df_f = df_f[df_f['ANO'].isin(anos)]
+    if ufs: df_f = df_f[df_f['UF'].isin(ufs)]
+    df_f['ID'].nunique(); df_f['MORTOS'].sum(); df_f['FERIDOS'].sum()
+    df_f[~df_f['SEXO'].isin(['NÃO INFORMADO'])]['SEXO'].value_counts()
+    df_f[~df_f['ESTADO_FISICO'].isin(['NÃO INFORMADO'])]['ESTADO_FISICO'].value_counts()
+    idade = df_f['IDADE']; idade[(idade > 0) & (idade <= 109)].value_counts()
+    df_f['TIPO_VEICULO'].value_counts().head(10)
+    df_fatal = df_f[(df_f['MORTOS'] > 0) | (df_f['ESTADO_FISICO'].astype(str).str.upper().isin(['ÓBITO', 'MORTO', 'FATAL']))].copy()
+    df_fatal = df_fatal[~df_fatal['MARCA'].astype(str).str.upper().isin(['NÃO INFORMADO'])]
+    for regex in ['MOTOCICLETA', 'AUTOM|CARRO', 'CAMINH']:
+        df_fatal[df_fatal['TIPO_VEICULO'].astype(str).str.upper().str.contains(regex)]['MARCA'].value_counts().head(15)
+    df_s = df_f.copy()
+    df_s['TIPO_V'] = df_s['TIPO_VEICULO'].str.upper()
+    df_s.loc[~df_s['TIPO_V'].apply(lambda x: any(t in str(x) for t in ['MOTOCICLETA', 'AUTOMÓVEL', 'CAMINHÃO'])), 'TIPO_V'] = 'OUTROS'
+    top_ufs = df_s['UF'].value_counts().head(15).index
+    df_s[df_s['UF'].isin(top_ufs)].groupby(['UF', 'TIPO_V'], observed=True).size()
+    df_f['UF'].value_counts(); df_f.groupby(['MUNICIPIO', 'UF'], observed=True).size()
+    for c in ['CAUSA_PRINCIPAL', 'CONDICAO_METEREOLOGICA', 'FASE_DIA', 'TIPO_PISTA']: df_f[c].value_counts()
+    coords = df_f[df_f['LAT'].notna() & (df_f['LAT'] != 0)][['LAT', 'LON']]
+    if len(coords) > 20000: coords.sample(20000)
+
+def grade_prf(df):
+    """Células de cada linha por nível (o que views.prf._grade_prf guarda por carga)."""
+    lat, lon = df['LAT'].to_numpy(), df['LON'].to_numpy()
+    return {nivel: celulas_geo(lat, lon, tamanho).astype(np.int32) for nivel, (tamanho, _, _) in NIVEIS_GRADE.items()}
+
+def paineis_atuais(df, indice, grade, anos, ufs):
+    """Mesmas agregações pelo caminho atual: índice invertido + recorte só das colunas usadas."""
+    from views import prf
+    linhas = filtrar_indice(indice, len(df), {'ANO': anos, 'UF': ufs})
+    fonte = prf._fonte_memoria(df, linhas, grade)
+    fonte['kpis']()
+    fonte['contagem']('SEXO', excluir=('NÃO INFORMADO',)); fonte['contagem']('ESTADO_FISICO', excluir=('NÃO INFORMADO',))
+    fonte['distribuicao']('IDADE', 0, 109); fonte['contagem']('TIPO_VEICULO', limite=10)
+    for regex in ['MOTOCICLETA', 'AUTOM|CARRO', 'CAMINH']: fonte['marcas_fatais'](regex, ('NÃO INFORMADO',))
+    prf._agrupar_frota(fonte['uf_tipo_veiculo']())
+    fonte['contagem']('UF'); fonte['municipios']()
+    for c in ['CAUSA_PRINCIPAL', 'CONDICAO_METEREOLOGICA', 'FASE_DIA', 'TIPO_PISTA']: fonte['contagem'](c)
+    fonte['grade_geo']('Brasil')  # nível padrão do mapa
+
+def medir_pico(func):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    func()
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / 1024 ** 2, duracao
+
+def bench_memoria(linhas):
+    print("\n--- PICO DE ALOCAÇÃO DOS PAINÉIS PRF (tracemalloc) ---")
+    cenarios = {'sem filtro': ([], []), '2 anos': ([2023, 2024], []), '1 ano + SP': ([2024], ['SP'])}
+    for n in linhas:
+        df = gerar_base_completa_prf(n)
+        indice, grade = indexar_prf(df), grade_prf(df)  # uma vez por carga, fora da medição (como no Dashboard)
+        print(f"  {n:>10,} linhas | base {df.memory_usage(deep=True).sum() / 1024 ** 2:,.0f} MB")
+        for nome, (anos, ufs) in cenarios.items():
+            pico_a, t_a = medir_pico(lambda: paineis_antigos(df, anos, ufs))
+            pico_d, t_d = medir_pico(lambda: paineis_atuais(df, indice, grade, anos, ufs))
+            print(f"    {nome:<12} antes {pico_a:8,.0f} MB ({t_a:5.2f}s) | depois {pico_d:8,.0f} MB ({t_d:5.2f}s) | {pico_a / pico_d:5.1f}x menos memória")
+
+# ==============================================================================
+# 4. TRECHOS CRÍTICOS (BR + KM)
+# ==============================================================================
+def trechos_direto(df, linhas):
+    """Sem índice: normaliza e ordena só as linhas filtradas a cada consulta."""
+    uf, br, km = (df[c].take(linhas) for c in ('UF', 'BR', 'KM'))
+    idx = trechos_prf.preparar_trechos(uf, br, km, df['MORTOS'].to_numpy()[linhas])
+    return trechos_prf.trechos_criticos(*trechos_prf.agregar_celulas(idx['celulas'], idx['mortos']), idx['ufs'])
+
+def trechos_indexado(df, idx, linhas):
+    """Com o índice da carga (como _trechos_prf no Dashboard): marca as linhas e agrega."""
+    if len(linhas) * 16 < len(df): return trechos_direto(df, linhas)  # mesmo corte do Dashboard
+    marca = np.zeros(len(df), dtype=bool)
+    marca[linhas] = True
+    manter = marca[idx['ordem']]
+    return trechos_prf.trechos_criticos(*trechos_prf.agregar_celulas(idx['celulas'][manter], idx['mortos'][manter]), idx['ufs'])
+
+def bench_trechos(linhas):
+    print("\n--- TRECHOS CRÍTICOS: por consulta vs índice por rodovia ---")
+    cenarios = {'sem filtro': ([], []), '1 ano': ([2024], []), '1 ano + SP': ([2024], ['SP'])}
+    for n in linhas:
+        df = gerar_base_prf(n)
+        rng = np.random.default_rng(1)
+        km = [f"{k / 10:.1f}".replace('.', ',') for k in range(0, 8000)]
+        df['KM'] = pd.Categorical.from_codes(rng.integers(0, len(km), n), km)
+        indice = indexar_prf(df)
+        idx, t_idx = cronometrar(lambda: trechos_prf.preparar_trechos(df['UF'], df['BR'], df['KM'], df['MORTOS'].to_numpy()))
+        print(f"  {n:>10,} linhas | índice por rodovia montado em {t_idx:.2f}s")
+        for nome, (anos, ufs) in cenarios.items():
+            linhas_f = filtrar_indice(indice, len(df), {'ANO': anos, 'UF': ufs})
+            ref, t_dir = cronometrar(lambda: trechos_direto(df, linhas_f))
+            res, t_ind = cronometrar(lambda: trechos_indexado(df, idx, linhas_f))
+            ok = "✓" if ref.equals(res) else "DIVERGENTE"
+            print(f"    {nome:<12} {len(linhas_f):>10,} linhas | direto {t_dir:6.2f}s | índice {t_ind:6.2f}s | {t_dir / t_ind:5.1f}x {ok}")
+
+# ==============================================================================
+# 5. RÉPLICAS: CÓPIA PRIVADA vs ESTOQUE COMPARTILHADO (Arrow IPC mapeado)
+# N processos seguram a mesma base ao mesmo tempo. Mede, por processo, o quanto a
+# memória cresceu desde antes da carga (/proc/self/smaps_rollup, só Linux):
+#   RSS: páginas residentes | USS: só as privadas | PSS: páginas compartilhadas divididas
+#   entre quem as mapeia. A soma dos PSS é a memória física real das N réplicas.
+# ==============================================================================
+def memoria_processo():
+    """{'rss', 'pss', 'uss'} em MB, de /proc/self/smaps_rollup."""
+    campos = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linha in f:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB': campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return {'rss': campos['Rss'], 'pss': campos['Pss'], 'uss': campos['Private_Clean'] + campos['Private_Dirty']}
+
+def replica(modo, n, pasta, barreira, fila):
+    """Uma réplica: carrega a base (privada ou mapeada), lê todas as colunas e mede quando todas estão de pé."""
+    antes = memoria_processo()
+    if modo == 'privado':
+        df = gerar_base_completa_prf(n)
+    else:
+        df = dataset_compartilhado.obter(pasta, 'prf', f"sintetica-{n}", lambda: gerar_base_completa_prf(n))
+    for c in df.columns:
+        # Lê uma posição por página (4 KB) de cada coluna: traz a base inteira para a memória sem alocar temporários
+        s = df[c].cat.codes if isinstance(df[c].dtype, pd.CategoricalDtype) else df[c]
+        valores = s.to_numpy()
+        valores[::max(1, 4096 // valores.itemsize)].sum()
+    barreira.wait()  # todas as réplicas seguram a base ao mesmo tempo
+    depois = memoria_processo()
+    fila.put({k: depois[k] - antes[k] for k in depois})
+    barreira.wait()
+
+def bench_replicas(linhas, processos=4):
+    print(f"\n--- {processos} RÉPLICAS: CÓPIA PRIVADA vs ARROW IPC MAPEADO (crescimento por processo) ---")
+    ctx = mp.get_context('spawn')  # réplica nova, sem herdar páginas do processo pai
+    for n in linhas:
+        with tempfile.TemporaryDirectory() as pasta:
+            totais = {}
+            for modo in ['privado', 'compartilhado']:
+                barreira, fila = ctx.Barrier(processos), ctx.Queue()
+                filhos = [ctx.Process(target=replica, args=(modo, n, pasta, barreira, fila)) for _ in range(processos)]
+                for p in filhos: p.start()
+                medidas = [fila.get() for _ in filhos]
+                for p in filhos: p.join()
+                totais[modo] = sum(m['pss'] for m in medidas)
+                media = {k: sum(m[k] for m in medidas) / processos for k in ('rss', 'pss', 'uss')}
+                print(f"  {n:>10,} linhas | {modo:<13} RSS {media['rss']:7,.0f} MB | USS {media['uss']:7,.0f} MB | "
+                      f"PSS {media['pss']:7,.0f} MB | soma PSS {totais[modo]:8,.0f} MB")
+            arquivo = os.path.getsize(dataset_compartilhado.caminho_dataset(pasta, 'prf', f"sintetica-{n}")) / 1024 ** 2
+            # Uma cópia física: a soma dos PSS fica perto do tamanho do arquivo, não de N cópias
+            ok = "✓ uma cópia física" if totais['compartilhado'] < 1.5 * arquivo + 16 * processos else "CÓPIAS PRIVADAS"
+            print(f"  {'':>10} arquivo {arquivo:,.0f} MB | {totais['privado'] / totais['compartilhado']:4.1f}x menos memória | {ok}")
+
+# ==============================================================================
+# MAIN
+# ==============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks da página PRF.")
+    parser.add_argument('benchmark', choices=['parsing', 'filtros', 'memoria', 'trechos', 'replicas'])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--processos', type=int, default=4, help="réplicas simultâneas (benchmark 'replicas')")
+    args = parser.parse_args()
+
+    if args.benchmark == 'parsing':
+        bench_parsing(args.linhas)
+    elif args.benchmark == 'filtros':
+        bench_filtros(args.linhas)
+    elif args.benchmark == 'memoria':
+        bench_memoria(args.linhas)
+    elif args.benchmark == 'trechos':
+        bench_trechos(args.linhas)
+    elif args.benchmark == 'replicas':
+        bench_replicas(args.linhas, args.processos)
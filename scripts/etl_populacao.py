@@ -2,6 +2,8 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 import re
 import os
+import unicodedata
+import versoes
 
 # --- CONFIGURAÇÕES ---
 # Caminho do arquivo (Ajuste se necessário)
@@ -22,6 +24,12 @@ def limpar_populacao(valor):
     except ValueError:
         return 0
 
+def normalizar_nome(texto):
+    """Maiúsculas, sem acentos e sem espaços repetidos (mesma regra de utils.normalizar_nome)."""
+    if pd.isna(texto): return None
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', texto).upper().strip()
+
 def salvar_no_banco(df, nome_tabela, engine):
     print(f"💾 Salvando tabela '{nome_tabela}' no banco MySQL...")
     try:
@@ -32,9 +40,11 @@ def salvar_no_banco(df, nome_tabela, engine):
         with engine.connect() as conn:
             # Índices para Municípios
             if nome_tabela == 'populacao_ibge':
-                conn.execute(text("CREATE INDEX idx_pop_uf ON populacao_ibge (uf)"))
-                conn.execute(text("CREATE INDEX idx_pop_mun ON populacao_ibge (municipio)"))
+                conn.execute(text("CREATE UNIQUE INDEX idx_pop_ibge ON populacao_ibge (id_ibge)"))
+                conn.execute(text("CREATE INDEX idx_pop_uf ON populacao_ibge (cod_uf)"))
+                conn.execute(text("CREATE INDEX idx_pop_mun ON populacao_ibge (uf, municipio_norm)"))
                 conn.commit()
+        versoes.registrar_versao(engine, nome_tabela, len(df), versoes.checksum_df(df))
                 
         print(f"✅ Tabela '{nome_tabela}' atualizada com sucesso ({len(df)} registros).")
     except Exception as e:
@@ -79,17 +89,17 @@ def processar_planilha():
             
             mapa = {
                 'UF': 'uf', 
+                'COD. UF': 'cod_uf',
+                'COD. MUNIC': 'cod_munic',
                 'NOME DO MUNIC': 'municipio', 
                 'POPULAÇ': 'populacao'
             }
             
-            # Filtra e renomeia colunas
-            colunas_existentes = {k: v for k, v in mapa.items() if any(k in c for c in df_original.columns)}
-            
-            # Encontra o nome exato da coluna na planilha
+            # Encontra o nome exato da coluna na planilha ('UF' só casa exato, senão pegaria 'COD. UF')
             mapa_real = {}
-            for chave_busca, nome_final in colunas_existentes.items():
-                col_real = next((c for c in df_original.columns if chave_busca in c), None)
+            for chave_busca, nome_final in mapa.items():
+                col_real = next((c for c in df_original.columns
+                                 if (c == chave_busca if chave_busca == 'UF' else chave_busca in c) and c not in mapa_real), None)
                 if col_real: mapa_real[col_real] = nome_final
 
             df = df_original.rename(columns=mapa_real)
@@ -106,11 +116,26 @@ def processar_planilha():
             termos_ignorar = ['BRASIL', 'REGIÃO', 'UNIDADE DA FEDERAÇÃO']
             df = df[~df['municipio'].str.upper().isin(termos_ignorar)]
 
+            # Chave da dimensão: código IBGE de 7 dígitos (COD. UF + COD. MUNIC com dígito verificador)
+            if 'cod_uf' in df.columns and 'cod_munic' in df.columns:
+                cod_uf = pd.to_numeric(df['cod_uf'], errors='coerce')
+                cod_munic = pd.to_numeric(df['cod_munic'], errors='coerce')
+                df['id_ibge'] = cod_uf * 100000 + cod_munic
+                df = df.dropna(subset=['id_ibge']).astype({'id_ibge': 'int64'})
+                df['cod_uf'] = cod_uf.loc[df.index].astype('int64')
+                df = df.drop(columns=['cod_munic'])
+            else:
+                print(f"⚠️ Aba '{nome_aba}' sem COD. UF / COD. MUNIC: ignorada (a dimensão exige o código IBGE).")
+                continue
+            df['uf'] = df['uf'].astype(str).str.upper().str.strip()
+            df['municipio_norm'] = df['municipio'].map(normalizar_nome)
+
             dfs_para_salvar.append(df)
 
     if dfs_para_salvar:
         # Junta todas as abas (caso os municípios estejam separados por região nas abas)
-        df_final = pd.concat(dfs_para_salvar, ignore_index=True)
+        df_final = pd.concat(dfs_para_salvar, ignore_index=True).drop_duplicates('id_ibge')
+        df_final = df_final[['id_ibge', 'cod_uf', 'uf', 'municipio', 'municipio_norm', 'populacao']]
         
         # Salva na tabela 'populacao_ibge' que o Dashboard vai usar
         salvar_no_banco(df_final, 'populacao_ibge', engine)
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# ==============================================================================
+# PREPARAÇÃO DA MALHA DOS ESTADOS (MAPA DE ENTREGAS)
+# Gera em GEO_DIR as variantes simplificadas + manifest.json lidos por
+# carregar_geojson. Rodar na build (ou copiar a pasta gerada) para o Dashboard
+# abrir o mapa sem acesso à internet.
+#   python scripts/preparar_geojson.py                       -> baixa da fonte (HTTPS verificado)
+#   python scripts/preparar_geojson.py --arquivo estados.geojson  -> ambiente isolado
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'app'))
+sys.path.append(BASE_DIR)
+from geo_malha import URL_FONTE_GEO, gerar_malhas, contar_vertices
+from config import settings
+
+def baixar(url):
+    import ssl
+    from urllib.request import urlopen
+    try:
+        import certifi
+        ctx = ssl.create_default_context(cafile=certifi.where())
+    except ImportError:
+        ctx = ssl.create_default_context()
+    with urlopen(url, context=ctx, timeout=60) as response:
+        return json.load(response)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a malha local dos estados e suas variantes simplificadas.")
+    parser.add_argument('--arquivo', help="GeoJSON de origem já baixado (em vez de baixar da fonte)")
+    parser.add_argument('--url', default=URL_FONTE_GEO)
+    parser.add_argument('--destino', default=settings.GEO_DIR)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.arquivo:
+        with open(args.arquivo, encoding='utf-8') as f: geo = json.load(f)
+        fonte = os.path.basename(args.arquivo)
+    else:
+        print(f"⬇️ Baixando {args.url}...")
+        geo = baixar(args.url)
+        fonte = args.url
+
+    manifesto = gerar_malhas(geo, args.destino, fonte)
+    print(f"✅ Malha versão {manifesto['versao']} gravada em {args.destino} "
+          f"({len(geo['features'])} estados, {contar_vertices(geo):,} vértices na origem, "
+          f"{time.perf_counter() - inicio:.1f}s)")
+    for nome, info in manifesto['variantes'].items():
+        print(f"   {nome:<10} tolerância {info['tolerancia']:<6} {info['vertices']:>8,} vértices {info['bytes'] / 1024:>9,.0f} KB")
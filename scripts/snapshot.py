@@ -0,0 +1,99 @@
+import os
+import shutil
+import time
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+# ==============================================================================
+# SNAPSHOTS COLUNARES (PARQUET) PARA O DASHBOARD
+# Layout: snapshots/<dataset>/<versao>/...  +  snapshots/<dataset>/ATUAL
+# 'ATUAL' guarda o nome da versão publicada; a troca é atômica (os.replace), então
+# o Dashboard nunca lê uma versão pela metade. Tabelas grandes são particionadas
+# no estilo hive (ex: ANO=2024/dados.parquet) para leitura com filtro por partição.
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+VERSOES_MANTIDAS = 2  # a anterior fica para leitores que ainda a tenham mapeada
+ARQUIVO_PARQUET = 'dados.parquet'
+
+def pasta_dataset(dataset):
+    return os.path.join(SNAPSHOT_DIR, dataset)
+
+def versao_atual(dataset):
+    """Nome da versão publicada do dataset, ou None."""
+    try:
+        with open(os.path.join(pasta_dataset(dataset), 'ATUAL'), encoding='utf-8') as f:
+            versao = f.read().strip()
+        return versao if os.path.isdir(os.path.join(pasta_dataset(dataset), versao)) else None
+    except FileNotFoundError:
+        return None
+
+def _nova_pasta(dataset):
+    versao = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    tmp = os.path.join(pasta_dataset(dataset), f".{versao}.tmp")
+    os.makedirs(tmp)
+    return versao, tmp
+
+def _publicar(dataset, versao, tmp):
+    """Renomeia a pasta temporária para a versão final, aponta ATUAL para ela e limpa versões antigas."""
+    base = pasta_dataset(dataset)
+    os.replace(tmp, os.path.join(base, versao))
+    ponteiro = os.path.join(base, 'ATUAL.tmp')
+    with open(ponteiro, 'w', encoding='utf-8') as f: f.write(versao)
+    os.replace(ponteiro, os.path.join(base, 'ATUAL'))
+
+    versoes = sorted(d for d in os.listdir(base) if os.path.isdir(os.path.join(base, d)) and not d.startswith('.'))
+    for antiga in versoes[:-VERSOES_MANTIDAS]:
+        shutil.rmtree(os.path.join(base, antiga), ignore_errors=True)
+
+def _escrever(df, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), caminho, compression='zstd')
+
+def salvar_snapshot_df(df, dataset):
+    """Publica um DataFrame pequeno (tabelas de gestão) como snapshot de arquivo único."""
+    if df is None or df.empty: return
+    try:
+        versao, tmp = _nova_pasta(dataset)
+        _escrever(df, os.path.join(tmp, ARQUIVO_PARQUET))
+        _publicar(dataset, versao, tmp)
+    except Exception as e:
+        print(f"  Aviso: snapshot '{dataset}' não gerado: {e}")
+
+def exportar_tabela(engine, tabela, particao=None, alteradas=None, dataset=None):
+    """
+    Exporta uma tabela do MySQL para um snapshot Parquet.
+    Com 'particao' (ex: 'ANO'), grava uma pasta por valor, lendo um valor por vez (memória limitada).
+    Com 'alteradas', só essas partições são relidas do banco; as demais são reaproveitadas
+    da versão atual por hard link (sem cópia).
+    """
+    dataset = dataset or tabela
+    inicio, tmp = time.time(), None
+    try:
+        versao, tmp = _nova_pasta(dataset)
+        with engine.connect() as conn:
+            if not particao:
+                _escrever(pd.read_sql(text(f"SELECT * FROM {tabela}"), conn), os.path.join(tmp, ARQUIVO_PARQUET))
+            else:
+                anterior = versao_atual(dataset)
+                valores = [v for v in pd.read_sql(text(f"SELECT DISTINCT {particao} AS v FROM {tabela}"), conn)['v'] if pd.notna(v)]
+                for valor in valores:
+                    destino = os.path.join(tmp, f"{particao}={valor}", ARQUIVO_PARQUET)
+                    origem = os.path.join(pasta_dataset(dataset), anterior or '', f"{particao}={valor}", ARQUIVO_PARQUET)
+                    if alteradas is not None and valor not in alteradas and anterior and os.path.exists(origem):
+                        os.makedirs(os.path.dirname(destino))
+                        os.link(origem, destino)
+                        continue
+                    df = pd.read_sql(text(f"SELECT * FROM {tabela} WHERE {particao} = :v"), conn, params={'v': valor})
+                    # A coluna da partição fica no nome da pasta (hive), não dentro do arquivo
+                    _escrever(df.drop(columns=[particao]), destino)
+        _publicar(dataset, versao, tmp)
+        print(f"  ✓ Snapshot '{dataset}' versão {versao} ({time.time() - inicio:.1f}s)")
+        return versao
+    except Exception as e:
+        print(f"  Aviso: snapshot '{dataset}' não gerado: {e}")
+        if tmp: shutil.rmtree(tmp, ignore_errors=True)
+        return None
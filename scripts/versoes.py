@@ -0,0 +1,52 @@
+import hashlib
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import text
+
+# ==============================================================================
+# CARIMBO DE VERSÃO DOS DATASETS (tabela dataset_versao)
+# Cada ETL, ao terminar de gravar uma tabela, registra quando ela foi carregada,
+# quantas linhas tem e um checksum do conteúdo. O Dashboard consulta esta tabela
+# (utils.versoes_datasets, TTL curto) e só recarrega os datasets cujo carimbo mudou.
+# O checksum vem de quem carregou (hash do DataFrame, dos arquivos de origem...);
+# sem ele, o banco calcula (CHECKSUM TABLE).
+# ==============================================================================
+SQL_TABELA_VERSAO = """
+    CREATE TABLE IF NOT EXISTS dataset_versao (
+        tabela VARCHAR(64) NOT NULL PRIMARY KEY,
+        carregado_em DATETIME NOT NULL,
+        linhas BIGINT NOT NULL,
+        checksum VARCHAR(64) NOT NULL
+    )
+"""
+
+def checksum_df(df):
+    """sha256 das colunas + hash por linha do pandas (mesmo conteúdo, mesma ordem -> mesmo checksum)."""
+    h = hashlib.sha256("|".join(map(str, df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def registrar_versao(engine, tabela, linhas=None, checksum=None):
+    """Grava (upsert) o carimbo da tabela. Falha aqui só avisa: a carga em si já foi feita."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(SQL_TABELA_VERSAO))
+            if linhas is None: linhas = conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
+            if checksum is None: checksum = str(conn.execute(text(f"CHECKSUM TABLE {tabela}")).fetchone()[1])
+            conn.execute(text("""
+                INSERT INTO dataset_versao (tabela, carregado_em, linhas, checksum)
+                VALUES (:tabela, :carregado_em, :linhas, :checksum)
+                ON DUPLICATE KEY UPDATE carregado_em = VALUES(carregado_em), linhas = VALUES(linhas),
+                                        checksum = VALUES(checksum)
+            """), {'tabela': tabela, 'carregado_em': datetime.now(), 'linhas': int(linhas), 'checksum': checksum})
+        print(f"  -> Versão de '{tabela}': {int(linhas):,} linhas, checksum {checksum[:12]}")
+    except Exception as e:
+        print(f"  Aviso: não foi possível registrar a versão de '{tabela}': {e}")
+
+def versao_registrada(engine, tabela):
+    """Checksum registrado da tabela, ou None."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT checksum FROM dataset_versao WHERE tabela = :t"), {'t': tabela}).scalar()
+    except Exception:
+        return None
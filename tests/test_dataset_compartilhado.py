@@ -0,0 +1,79 @@
+import multiprocessing as mp
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+import dataset_compartilhado
+
+PROCESSOS = 4
+VERSAO = 'prf-teste'
+
+
+def _base():
+    """Base pequena com os tipos da PRF compacta: categorias, floats com NaN e inteiros."""
+    n = 50_000
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'UF': pd.Categorical(rng.choice(['SP', 'MG', 'RJ', 'BA'], n)),
+        'LATITUDE': np.where(rng.random(n) < 0.1, np.nan, rng.uniform(-33, 5, n)),
+        'MORTOS': rng.integers(0, 5, n).astype('int16'),
+    })
+    df.attrs['versao_prf'] = VERSAO
+    return df
+
+
+def _carregar(pasta_cargas):
+    # Cada carga deixa um arquivo: o teste conta quantas réplicas carregaram a base
+    open(os.path.join(pasta_cargas, str(os.getpid())), 'w').close()
+    return _base()
+
+
+def _replica(pasta, pasta_cargas, barreira, fila):
+    barreira.wait()  # todas pedem a mesma versão ao mesmo tempo
+    df = dataset_compartilhado.obter(pasta, 'prf', VERSAO, lambda: _carregar(pasta_cargas))
+    latitude, codigos = df['LATITUDE'].to_numpy(), df['UF'].array.codes
+    try:
+        latitude[0] = 0.0
+        alterou = True
+    except ValueError:
+        alterou = False
+    fila.put({
+        'soma': int(pd.util.hash_pandas_object(df, index=False).sum()),
+        'attrs': dict(df.attrs),
+        'somente_leitura': not latitude.flags.writeable and not codigos.flags.writeable,
+        'alterou': alterou,
+    })
+
+
+def test_replicas_compartilham_uma_carga(tmp_path):
+    """N processos pedem a mesma versão: uma carga só, o mesmo resultado em todos, arrays mapeados somente leitura."""
+    pasta, pasta_cargas = str(tmp_path / 'compartilhado'), str(tmp_path / 'cargas')
+    os.makedirs(pasta_cargas)
+    contexto = mp.get_context('spawn')
+    barreira, fila = contexto.Barrier(PROCESSOS), contexto.Queue()
+    processos = [contexto.Process(target=_replica, args=(pasta, pasta_cargas, barreira, fila)) for _ in range(PROCESSOS)]
+    for p in processos: p.start()
+    resultados = [fila.get(timeout=120) for _ in processos]
+    for p in processos: p.join(timeout=30)
+
+    assert all(p.exitcode == 0 for p in processos)
+    assert len(os.listdir(pasta_cargas)) == 1
+    esperado = int(pd.util.hash_pandas_object(_base(), index=False).sum())
+    assert [r['soma'] for r in resultados] == [esperado] * PROCESSOS
+    assert all(r['attrs'] == {'versao_prf': VERSAO} for r in resultados)
+    assert all(r['somente_leitura'] and not r['alterou'] for r in resultados)
+    assert os.path.exists(dataset_compartilhado.caminho_dataset(pasta, 'prf', VERSAO))
+
+
+def test_carga_vazia_nao_e_publicada(tmp_path):
+    """Falha de carga (DataFrame vazio) volta como cópia privada e não vira arquivo da versão."""
+    pasta = str(tmp_path)
+    df = dataset_compartilhado.obter(pasta, 'prf', VERSAO, pd.DataFrame)
+    assert df.empty
+    assert not os.path.exists(dataset_compartilhado.caminho_dataset(pasta, 'prf', VERSAO))
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from etl_process import escrever_arquivo_carga, ler_arquivo_carga, ler_prf_em_chunks
+
+
+def test_arquivo_carga_ida_e_volta(tmp_path):
+    """Arquivo de staging do LOAD DATA relido para o fallback to_sql: nulos continuam nulos, textos intactos."""
+    original = pd.DataFrame({
+        'ID': [1, 2, 3, 4],
+        'UF': ['SP', None, 'N', '\\N'],  # 'N' e '\N' literais não podem virar nulo (nem o nulo virar 'N')
+        'MUNICIPIO': ['C:\\PASTA', 'A\\\\B', 'fim\\', 'SÃO PAULO'],
+        'LATITUDE': [-23.5, np.nan, 0.0, 1e-7],
+        'DATA_INVERSA': pd.to_datetime(['2024-01-31', None, '2023-12-01', '2024-02-29']),
+    })
+    caminho = str(tmp_path / 'lote.tsv')
+    escrever_arquivo_carga(original, caminho)
+    lido = ler_arquivo_carga(caminho, original.columns)
+
+    assert lido['UF'].tolist()[0] == 'SP' and pd.isna(lido['UF'][1])
+    assert lido['UF'].tolist()[2:] == ['N', '\\N']
+    assert lido['MUNICIPIO'].tolist() == original['MUNICIPIO'].tolist()
+    assert lido['ID'].tolist() == [1, 2, 3, 4]
+    np.testing.assert_array_equal(lido['LATITUDE'].to_numpy(), original['LATITUDE'].to_numpy())
+    pd.testing.assert_series_equal(lido['DATA_INVERSA'], original['DATA_INVERSA'], check_dtype=False)
+
+
+def test_arquivo_carga_tabs_e_quebras(tmp_path):
+    """TABs e quebras de linha nos textos viram espaço (não quebram o alinhamento das colunas)."""
+    original = pd.DataFrame({'UF': ['S\tP', 'R\nJ'], 'BR': ['116', None]})
+    caminho = str(tmp_path / 'lote.tsv')
+    escrever_arquivo_carga(original, caminho)
+    lido = ler_arquivo_carga(caminho, original.columns)
+    assert lido['UF'].tolist() == ['S P', 'R J']
+    assert lido['BR'][0] == '116' and pd.isna(lido['BR'][1])
+
+
+def test_limpeza_prf_igual_em_todos_os_chunks(tmp_path):
+    """Decisões da limpeza valem para o arquivo inteiro, não para cada chunk."""
+    linhas = ['id;causa_principal;causa_acidente;feridos;feridos_leves;feridos_graves',
+              '1;Sim;Velocidade;2;1;1',
+              '2;Não;Chuva;1;1;0',
+              '3;;Sono;0;1;0',  # primeiro do 2º chunk: atípico, e sem feridos no chunk
+              '4;Sim;Animais;0;0;1']
+    (tmp_path / 'acidentes2024.csv').write_text("\n".join(linhas), encoding='utf-8')
+    df = pd.concat(ler_prf_em_chunks(str(tmp_path), ['acidentes2024.csv'], tamanho_chunk=2), ignore_index=True)
+    assert df['CAUSA_PRINCIPAL'].tolist() == ['Velocidade', 'Chuva', 'Sono', 'Animais']
+    assert df['FERIDOS'].tolist() == [2, 1, 0, 0]